@@ -1,15 +1,20 @@
 import streamlit as st
-import speech_recognition as sr
-import pyttsx3
-import wave
 import os
 import time
-import json
 from datetime import datetime
-from pathlib import Path
-import tempfile
 import threading
-import queue
+import uuid
+import functools
+import importlib
+
+# speech_recognition, NumPy and the modules built on them are imported where
+# they are first used, so the first page render doesn't wait for them
+from event_log import EventLog, EventSink
+from history_store import HistoryStore
+from job_scheduler import JobScheduler, QueueFullError
+from result_cache import ResultCache, cache_key
+from session_stats import PerformanceStats
+from tracing import Tracer, current_trace_id
 
 # Page configuration
 st.set_page_config(
@@ -250,9 +255,215 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+HEADER_HTML = """
+<div class="main-header">
+    <h1>🎤 Advanced Speech-to-Text System</h1>
+    <p>Real-time voice transcription with multiple recognition methods</p>
+</div>
+"""
+
+STAT_CARD_HTML = """
+<div class="stat-card">
+    <div class="stat-value">{}</div>
+    <div class="stat-label">{}</div>
+</div>
+"""
+
+LOG_ENTRY_HTML = """<div class="log-entry {}"><strong>[{}]</strong> {}</div>"""
+
+# Number of warm recognition engines shared by all sessions
+ENGINE_POOL_SIZE = int(os.environ.get('STT_ENGINE_POOL_SIZE', 2))
+
+
+@st.cache_resource(show_spinner=False)
+def get_engine_pool(size=ENGINE_POOL_SIZE):
+    """Process-wide pool of warm recognizers, shared across sessions; engines are built by prewarm_engines()"""
+    from engine_pool import EnginePool
+    return EnginePool(size, lazy=True)
+
+
+# Modules with the recognition engines, imported by prewarm_engines() after the first render
+ENGINE_MODULES = ('speech_recognition', 'audio_processing', 'engine_pool', 'recognition', 'mic_pipeline', 'scoring')
+
+
+@st.cache_resource
+def get_startup_timings():
+    """Engine import, prewarm and first-request times of this server process"""
+    return {'started': time.time(), 'import': None, 'warm': {}, 'first_request': None}
+
+
+def prewarm_engines(language='en-US'):
+    """
+    Import the engine modules, then warm the pool for a language on a background thread
+
+    Called once the page has been sent. The imports stay on the script
+    thread because Streamlit only puts the app directory on sys.path while
+    the script runs; building engines and loading decoders, the slow part,
+    happens once per process and language in the background.
+    """
+    timings = get_startup_timings()
+    if timings['import'] is None:
+        start = time.perf_counter()
+        for module in ENGINE_MODULES:
+            importlib.import_module(module)
+        timings['import'] = time.perf_counter() - start
+    if language in timings['warm']:
+        return
+    timings['warm'][language] = None
+    
+    def run():
+        timings['warm'][language] = get_engine_pool().warm([language])
+    
+    threading.Thread(target=run, name='engine-prewarm', daemon=True).start()
+
+
+def log_startup_timings():
+    """Add prewarm and first-request times to this session's log as they become available"""
+    timings = get_startup_timings()
+    logged = st.session_state.startup_logged
+    if timings['import'] is not None and 'import' not in logged:
+        logged.add('import')
+        add_log(f"Engine modules imported in {timings['import']:.2f}s", 'info', 'startup', timings['import'])
+    for language, seconds in list(timings['warm'].items()):
+        if seconds is not None and language not in logged:
+            logged.add(language)
+            add_log(f"Recognition engines warmed for {language} in {seconds:.2f}s", 'info', 'startup', seconds)
+    first = timings['first_request']
+    if first is not None and 'first_request' not in logged:
+        logged.add('first_request')
+        add_log(f"First request of this server took {first['seconds']:.2f}s, "
+                f"{first['since_start']:.1f}s after startup", 'info', 'startup', first['seconds'])
+
+
+# Transcription cache: in-memory LRU size and optional on-disk directory
+RESULT_CACHE_SIZE = int(os.environ.get('STT_CACHE_SIZE', 256))
+RESULT_CACHE_DIR = os.environ.get('STT_CACHE_DIR')
+
+# Per-stage timing: set STT_TRACING=0 to disable; traces/metrics files and port are optional
+TRACING_ENABLED = os.environ.get('STT_TRACING', '1') != '0'
+TRACE_FILE = os.environ.get('STT_TRACE_FILE')
+METRICS_FILE = os.environ.get('STT_METRICS_FILE')
+METRICS_PORT = os.environ.get('STT_METRICS_PORT')
+
+# Recognition job queue: one worker per warm engine so a running job never waits for a lease,
+# a bounded queue, and the Google Web Speech request rate shared by all sessions (0 = unlimited)
+JOB_WORKERS = int(os.environ.get('STT_JOB_WORKERS', ENGINE_POOL_SIZE))
+JOB_QUEUE_SIZE = int(os.environ.get('STT_JOB_QUEUE_SIZE', 32))
+JOBS_PER_SESSION = int(os.environ.get('STT_JOBS_PER_SESSION', 4))
+GOOGLE_RATE_LIMIT = float(os.environ.get('STT_GOOGLE_RATE', 2))
+GOOGLE_BURST = int(os.environ.get('STT_GOOGLE_BURST', 5))
+
+# Default seconds Google gets before Sphinx is raced against it, and the circuit breaker
+# that skips Google after repeated failures or missed budgets
+LATENCY_BUDGET = float(os.environ.get('STT_LATENCY_BUDGET', 3.0))
+# The budget is for this much audio and grows in proportion for longer recordings
+LATENCY_BUDGET_AUDIO_SECONDS = 10.0
+BREAKER_FAILURES = int(os.environ.get('STT_BREAKER_FAILURES', 3))
+BREAKER_COOLDOWN = float(os.environ.get('STT_BREAKER_COOLDOWN', 30))
+
+# SQLite file holding the transcription history
+HISTORY_DB_PATH = os.environ.get('STT_HISTORY_DB', 'transcription_history.db')
+
+# Seconds a microphone's ambient-noise calibration stays valid
+CALIBRATION_MAX_AGE = 300
+
+
+@st.cache_resource
+def get_calibration_cache():
+    """Ambient-noise thresholds per microphone, shared across sessions"""
+    from mic_pipeline import CalibrationCache
+    return CalibrationCache(CALIBRATION_MAX_AGE)
+
+
+@st.cache_resource
+def get_tracer():
+    """Stage timer and metrics exporter, shared across sessions"""
+    tracer = Tracer(TRACING_ENABLED, TRACE_FILE, METRICS_FILE)
+    if METRICS_PORT:
+        tracer.serve_metrics(int(METRICS_PORT))
+    return tracer
+
+
+def traced(name, standalone=True):
+    """
+    Run the decorated function inside a tracing span
+
+    With standalone=False the span is only recorded inside an enclosing
+    trace, so timer-driven panel refreshes don't each emit a trace.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            tracer = get_tracer()
+            with (tracer.trace(name) if standalone else tracer.span(name)):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# Activity log: events kept per session for the UI, and a rotating JSONL file
+# with every event (set STT_EVENT_LOG to an empty string to disable it)
+LOG_CAPACITY = int(os.environ.get('STT_LOG_CAPACITY', 100))
+EVENT_LOG_PATH = os.environ.get('STT_EVENT_LOG', 'activity_log.jsonl')
+EVENT_LOG_MAX_BYTES = int(os.environ.get('STT_EVENT_LOG_BYTES', 10 * 1024 * 1024))
+EVENT_LOG_BACKUPS = 5
+
+
+@st.cache_resource
+def get_event_sink():
+    """Background writer of activity events to disk, shared across sessions"""
+    if not EVENT_LOG_PATH:
+        return None
+    return EventSink(EVENT_LOG_PATH, EVENT_LOG_MAX_BYTES, EVENT_LOG_BACKUPS)
+
+
+def new_activity_log():
+    """Empty activity log for the current session id"""
+    return EventLog(LOG_CAPACITY, get_event_sink(), session_id=st.session_state.session_id)
+
+
+@st.cache_resource
+def get_history_store():
+    """Durable transcription history, shared across sessions"""
+    return HistoryStore(HISTORY_DB_PATH)
+
+
+@st.cache_resource
+def get_result_cache():
+    """Content-addressed transcription cache, shared across sessions"""
+    return ResultCache(RESULT_CACHE_SIZE, RESULT_CACHE_DIR)
+
+
+@st.cache_resource
+def get_google_breaker():
+    """Circuit breaker for the Google Web Speech API, shared across sessions"""
+    from recognition import CircuitBreaker
+    return CircuitBreaker(BREAKER_FAILURES, BREAKER_COOLDOWN)
+
+
+@st.cache_resource
+def get_scheduler():
+    """Recognition job queue with fair share across sessions, shared by all of them"""
+    return JobScheduler(JOB_WORKERS, JOB_QUEUE_SIZE, JOBS_PER_SESSION,
+                        rate_limits={'google': (GOOGLE_RATE_LIMIT, GOOGLE_BURST)})
+
+
+# Automatic language identification: candidates tried by default, seconds of speech
+# sent per candidate, and how many identified languages are remembered
+AUTO_LANGUAGES = os.environ.get('STT_AUTO_LANGUAGES', 'en-US,es-ES,fr-FR,de-DE,hi-IN').split(',')
+AUTO_PROBE_SECONDS = float(os.environ.get('STT_AUTO_PROBE', 4.0))
+LANGUAGE_CHOICES_SIZE = 1024
+
+
+@st.cache_resource
+def get_language_choices():
+    """Languages identified in auto mode, keyed by session and source, shared across sessions"""
+    return ResultCache(LANGUAGE_CHOICES_SIZE)
+
+
 # Initialize session state
-if 'transcription_history' not in st.session_state:
-    st.session_state.transcription_history = []
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
 if 'current_transcription' not in st.session_state:
     st.session_state.current_transcription = ""
 if 'stats' not in st.session_state:
@@ -260,29 +471,40 @@ if 'stats' not in st.session_state:
         'total_words': 0,
         'total_characters': 0,
         'recognition_time': 0,
-        'sessions': 0
+        'transcriptions': 0,
+        'requests': 0
     }
+if 'performance' not in st.session_state:
+    st.session_state.performance = PerformanceStats()
 if 'activity_log' not in st.session_state:
-    st.session_state.activity_log = []
+    st.session_state.activity_log = new_activity_log()
 if 'is_listening' not in st.session_state:
     st.session_state.is_listening = False
+if 'decoded_audio' not in st.session_state:
+    st.session_state.decoded_audio = {}
+if 'listener' not in st.session_state:
+    st.session_state.listener = None
+if 'jobs' not in st.session_state:
+    st.session_state.jobs = {}
+if 'last_result' not in st.session_state:
+    st.session_state.last_result = None
+if 'startup_logged' not in st.session_state:
+    st.session_state.startup_logged = set()
 
 
-def add_log(message, log_type='info'):
-    """Add entry to activity log"""
-    timestamp = datetime.now().strftime("%H:%M:%S")
-    log_class = f"log-{log_type}"
-    st.session_state.activity_log.append({
-        'timestamp': timestamp,
-        'message': message,
-        'type': log_class
-    })
-    # Keep only last 20 entries
-    if len(st.session_state.activity_log) > 20:
-        st.session_state.activity_log = st.session_state.activity_log[-20:]
+def add_log(message, log_type='info', stage=None, duration=None, job_id=None):
+    """Add an event to the activity log, tagged with the current trace and the job it concerns"""
+    st.session_state.activity_log.add(message, log_type, stage, duration,
+                                      trace_id=current_trace_id(), job_id=job_id)
+
 
+def add_history(entry):
+    """Append a transcription to the durable history store"""
+    get_history_store().append(entry, st.session_state.session_id)
+    st.session_state.stats['transcriptions'] += 1
 
-def update_stats(text, recognition_time):
+
+def update_stats(text, recognition_time, engine='google', language='en-US', audio_duration=None):
     """Update session statistics"""
     words = len(text.split())
     chars = len(text)
@@ -290,235 +512,772 @@ def update_stats(text, recognition_time):
     st.session_state.stats['total_words'] += words
     st.session_state.stats['total_characters'] += chars
     st.session_state.stats['recognition_time'] += recognition_time
+    st.session_state.stats['requests'] += 1
+    st.session_state.performance.record(engine, language, recognition_time, audio_duration)
 
 
-def process_audio_file(uploaded_file, language='en-US'):
-    """Process uploaded audio file"""
-    recognizer = sr.Recognizer()
+def record_failure(recognition_time, engine='google', language='en-US'):
+    """Count a recognition request that produced no transcription"""
+    st.session_state.stats['requests'] += 1
+    st.session_state.performance.record(engine, language, recognition_time, success=False)
+
+
+def get_decoded_audio(uploaded_file):
+    """Decode an upload once and reuse the PCM for every action on it"""
+    key = getattr(uploaded_file, 'file_id', None) or (uploaded_file.name, uploaded_file.size)
+    cached = st.session_state.decoded_audio
+    if cached.get('key') != key:
+        # Only the current upload is kept so memory doesn't grow with every file
+        from audio_processing import load_audio
+        uploaded_file.seek(0)
+        start_time = time.perf_counter()
+        audio, info = load_audio(uploaded_file)
+        cached = {'key': key, 'audio': audio}
+        st.session_state.decoded_audio = cached
+        add_log(
+            f"Decoded {uploaded_file.name}: {info['source_rate']} Hz x{info['source_channels']} → "
+            f"{audio.sample_rate // 1000} kHz mono, payload {info['source_bytes'] / 1024:.0f} KB → {info['bytes'] / 1024:.0f} KB",
+            'info', 'decode', time.perf_counter() - start_time
+        )
+    return cached['audio']
+
+
+def choose_language(language, source):
+    """
+    Resolve the 'auto' language setting for a source (script thread only)
+
+    Returns (language, choose). language is the fixed language, the one
+    identified earlier for this source in this session, or 'auto' when it
+    is still unknown. choose(recognizer, audio) -> (language, detection)
+    runs inside the job: it identifies the language among the candidate
+    languages when needed (detection is None otherwise) and remembers it,
+    so later requests from the same source skip identification.
+    """
+    if language != 'auto':
+        return language, lambda recognizer, audio: (language, None)
+    choices = get_language_choices()
+    key = f"{st.session_state.session_id}:{source}"
+    chosen = choices.get(key)
+    if chosen is not None:
+        add_log(f"Using {chosen}, identified earlier for {source}", 'info', 'language')
+        return chosen, lambda recognizer, audio: (chosen, None)
     
+    from recognition import identify_language
+    candidates = st.session_state.get('auto_languages') or AUTO_LANGUAGES
+    scheduler = get_scheduler()
+    tracer = get_tracer()
+    
+    def choose(recognizer, audio):
+        # An earlier phrase or job from this source may have identified it meanwhile
+        chosen = choices.get(key)
+        if chosen is not None:
+            return chosen, None
+        with tracer.span('identify_language', candidates=len(candidates)) as span:
+            detection = identify_language(recognizer, audio, candidates, AUTO_PROBE_SECONDS,
+                                          throttle=lambda: scheduler.throttle('google'))
+            span.set(language=detection['language'], cancelled=len(detection['cancelled']))
+        choices.put(key, detection['language'])
+        return detection['language'], detection
+    
+    return 'auto', choose
+
+
+def known_language(language, source):
+    """The language a finished request from source was recognized in, for history and stats"""
+    if language != 'auto':
+        return language
+    return get_language_choices().get(f"{st.session_state.session_id}:{source}") or language
+
+
+def submit_job(kind, fn, backend='google', **context):
+    """
+    Queue fn(job) on the shared scheduler and track it for this session
+
+    fn runs on a worker thread, so it must not touch st.session_state;
+    render_jobs() hands the finished job to apply_job_result() on the
+    script thread. Returns the job id, or None if the queue is full.
+    """
     try:
-        # Save uploaded file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as tmp_file:
-            tmp_file.write(uploaded_file.getvalue())
-            tmp_file_path = tmp_file.name
+        job_id = get_scheduler().submit(st.session_state.session_id, fn, backend, context['label'])
+    except QueueFullError as e:
+        add_log(f"Server busy, {context['label']} was not queued ({e})", 'error', 'queue')
+        st.session_state.last_result = {'error': "Server busy, please try again in a moment"}
+        return None
+    st.session_state.jobs[job_id] = dict(context, kind=kind, job_id=job_id)
+    add_log(f"Queued {context['label']} (job {job_id})", 'info', 'queue', job_id=job_id)
+    return job_id
+
+
+@traced('process_audio_file')
+def process_audio_file(uploaded_file, language='en-US', segmented=False, max_workers=4, latency_budget=None):
+    """Process uploaded audio file"""
+    from audio_processing import audio_duration
+    from recognition import recognize_hedged, scale_budget
+    try:
+        add_log(f"Processing audio file: {uploaded_file.name}", 'info', 'upload')
+        tracer = get_tracer()
+        with tracer.span('decode') as span:
+            audio = get_decoded_audio(uploaded_file)
+            span.set(audio_seconds=audio_duration(audio))
+        context = {'label': uploaded_file.name, 'source': uploaded_file.name, 'language': language,
+                   'audio_duration': audio_duration(audio)}
         
-        with sr.AudioFile(tmp_file_path) as source:
-            add_log(f"Processing audio file: {uploaded_file.name}", 'info')
-            audio = recognizer.record(source)
-            
-            start_time = time.time()
-            
-            try:
-                # Get detailed results
-                result = recognizer.recognize_google(audio, language=language, show_all=True)
-                recognition_time = time.time() - start_time
-                
-                if isinstance(result, dict) and 'alternative' in result:
-                    alternatives = result['alternative']
-                    best_result = alternatives[0]
-                    transcription = best_result.get('transcript', '')
-                    confidence = best_result.get('confidence', 0)
-                    
-                    # Update session state
-                    st.session_state.current_transcription = transcription
-                    st.session_state.transcription_history.append({
-                        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                        'text': transcription,
-                        'confidence': confidence,
-                        'recognition_time': recognition_time,
-                        'source': uploaded_file.name,
-                        'language': language
-                    })
-                    
-                    update_stats(transcription, recognition_time)
-                    add_log(f"Successfully transcribed: {transcription[:50]}...", 'success')
-                    
-                    return {
-                        'transcription': transcription,
-                        'confidence': confidence,
-                        'recognition_time': recognition_time,
-                        'alternatives': alternatives[1:4] if len(alternatives) > 1 else []
-                    }
-                else:
-                    transcription = str(result)
-                    st.session_state.current_transcription = transcription
-                    return {'transcription': transcription}
-                    
-            except sr.UnknownValueError:
-                add_log("Could not understand audio in file", 'error')
-                return None
-            except sr.RequestError as e:
-                add_log(f"API Error: {e}", 'error')
-                return None
+        if segmented:
+            return transcribe_segmented(audio, language, max_workers, context, latency_budget)
+        
+        # Audio that was already transcribed is answered without queueing a job
+        start_time = time.time()
+        cache = get_result_cache()
+        language, choose = choose_language(language, uploaded_file.name)
+        key, result = None, None
+        if language != 'auto':
+            with tracer.span('cache_lookup'):
+                key = cache_key(audio, language, 'google', show_all=True)
+                result = cache.get(key)
+        if result is not None:
+            add_log("Using cached transcription", 'info', 'cache')
+            transcription, confidence, alternatives = result
+            finish_transcription(dict(context, kind='file', engine='google (cached)'), {
+                'transcription': transcription,
+                'confidence': confidence,
+                'recognition_time': time.time() - start_time,
+                'alternatives': alternatives
+            })
+            return None
+        
+        pool = get_engine_pool()
+        breaker = get_google_breaker()
+        
+        def run(job):
+            with tracer.trace('job:process_audio_file', job_id=job.id):
+                start_time = time.time()
+                with pool.lease() as recognizer:
+                    chosen, detection = choose(recognizer, audio)
+                    with tracer.span('recognize', engine='google') as span:
+                        result = recognize_hedged(recognizer, audio, chosen,
+                                                  scale_budget(latency_budget, audio, LATENCY_BUDGET_AUDIO_SECONDS),
+                                                  breaker)
+                        span.set(answered_by=result['engine'])
+                # Fallback transcripts aren't cached, so the next request can still get Google's
+                if result['engine'] == 'google':
+                    cache.put(key or cache_key(audio, chosen, 'google', show_all=True),
+                              (result['text'], result['confidence'], result['alternatives']))
+                return {
+                    'transcription': result['text'],
+                    'confidence': result['confidence'],
+                    'recognition_time': time.time() - start_time,
+                    'alternatives': result['alternatives'],
+                    'engine': result['engine'],
+                    'fallback_reason': result['fallback_reason'],
+                    'detection': detection
+                }
+        
+        return submit_job('file', run, 'google', engine='google',
+                          not_understood="Could not understand audio in file", **context)
         
     except Exception as e:
-        add_log(f"Error processing file: {e}", 'error')
+        add_log(f"Error processing file: {e}", 'error', 'upload')
         return None
-    finally:
-        # Clean up temp file
-        if 'tmp_file_path' in locals():
-            try:
-                os.unlink(tmp_file_path)
-            except:
-                pass
 
 
-def listen_from_microphone(duration=5, language='en-US'):
-    """Listen to microphone and transcribe"""
-    recognizer = sr.Recognizer()
+def transcribe_segmented(audio, language='en-US', max_workers=4, context=None, latency_budget=None):
+    """Split audio on silence and queue a job transcribing the segments in parallel"""
+    import speech_recognition as sr
+    from recognition import recognize_hedged, scale_budget, segment_audio, transcribe_segments
+    tracer = get_tracer()
+    with tracer.span('segment') as span:
+        segments = segment_audio(audio)
+        span.set(segments=len(segments))
+    if not segments:
+        add_log("No speech detected in file", 'error', 'segment')
+        return None
+    add_log(f"Split audio into {len(segments)} segments, using {max_workers} workers", 'info', 'segment')
     
-    try:
-        with sr.Microphone() as source:
-            add_log("Adjusting for ambient noise...", 'info')
-            recognizer.adjust_for_ambient_noise(source, duration=1)
+    pool = get_engine_pool()
+    cache = get_result_cache()
+    scheduler = get_scheduler()
+    breaker = get_google_breaker()
+    language, choose = choose_language(language, context['source'])
+    
+    def run(job):
+        with tracer.trace('job:transcribe_segmented', job_id=job.id, segments=len(segments)), \
+                pool.lease() as recognizer:
+            fallback_segments = []
+            chosen, detection = choose(recognizer, audio)
             
-            add_log(f"Listening for {duration} seconds...", 'info')
-            audio = recognizer.listen(source, timeout=duration, phrase_time_limit=duration)
+            def recognize(segment_audio_data):
+                key = cache_key(segment_audio_data, chosen, 'google', show_all=True)
+                result = cache.get(key)
+                if result is None:
+                    # Every segment is a separate request against the shared rate limit
+                    scheduler.throttle('google')
+                    hedged = recognize_hedged(recognizer, segment_audio_data, chosen,
+                                              scale_budget(latency_budget, segment_audio_data,
+                                                           LATENCY_BUDGET_AUDIO_SECONDS), breaker)
+                    result = (hedged['text'], hedged['confidence'] or 0, hedged['alternatives'])
+                    if hedged['engine'] == 'google':
+                        cache.put(key, result)
+                    else:
+                        fallback_segments.append(hedged['fallback_reason'])
+                return result
             
-            add_log("Processing speech...", 'info')
             start_time = time.time()
+            results = []
+            first_segment_time = None
+            with tracer.span('recognize_segments', workers=max_workers):
+                for entry in transcribe_segments(segments, recognize, max_workers):
+                    results.append(entry)
+                    if entry['index'] == 0:
+                        first_segment_time = time.time() - start_time
+                        tracer.record('first_segment', first_segment_time)
+                    job.report(len(results) / len(segments),
+                               " ".join(e['text'] for e in results if e['text']) or "...")
+            
+            errors = [f"segment {entry['index'] + 1}: {entry['error']}" for entry in results if entry['error']]
+            recognized = [entry for entry in results if entry['text']]
+            if not recognized:
+                if errors:
+                    raise sr.RequestError(errors[0])
+                raise sr.UnknownValueError()
+            
+            return {
+                'transcription': ' '.join(entry['text'] for entry in recognized),
+                'confidence': sum(entry['confidence'] for entry in recognized) / len(recognized),
+                'recognition_time': time.time() - start_time,
+                'segments': [{key: entry[key] for key in ('start', 'end', 'text', 'confidence')} for entry in results],
+                'errors': errors,
+                'first_segment_time': first_segment_time,
+                'fallback_reason': (f"{len(fallback_segments)} segments used Sphinx ({fallback_segments[0]})"
+                                    if fallback_segments else None),
+                'detection': detection
+            }
+    
+    return submit_job('segmented', run, None, engine='google (segmented)',
+                      not_understood="Could not understand audio in file", **context)
+
+
+# Frames per second of the live spectrogram and level meter
+LIVE_VIEW_FPS = 5
+# Level meter scale: the bar is empty at this level and full at 0 dBFS
+METER_FLOOR_DB = -60.0
+
+
+def draw_audio_monitor(monitor):
+    """Analyze the audio captured since the last frame and draw the spectrogram and level meter"""
+    levels = monitor.update()
+    image = monitor.rgb()
+    if image is not None:
+        st.image(image, caption=f"0 – {monitor.spectrogram.max_freq / 1000:.0f} kHz, last "
+                                f"{monitor.columns * monitor.spectrogram.hop / monitor.sample_rate:.0f}s",
+                 width='stretch')
+    level = min(1.0, max(0.0, 1 - levels['rms_db'] / METER_FLOOR_DB))
+    text = f"🔊 RMS {levels['rms_db']:.0f} dBFS · peak {levels['hold_db']:.0f} dBFS"
+    if levels['clipped']:
+        text += " · ⚠️ clipping"
+    st.progress(level, text=text)
+
+
+def run_with_live_view(capture, monitor):
+    """
+    Run capture() on a background thread and redraw the monitor at LIVE_VIEW_FPS until it returns
+
+    The script thread only draws, so a slow frame never holds up the
+    microphone; the placeholder is cleared once capture finishes.
+    """
+    outcome = {}
+    
+    def run():
+        try:
+            outcome['result'] = capture()
+        except Exception as e:
+            outcome['error'] = e
+    
+    thread = threading.Thread(target=run, name='mic-listen', daemon=True)
+    thread.start()
+    placeholder = st.empty()
+    interval = 1 / LIVE_VIEW_FPS
+    while thread.is_alive():
+        deadline = time.perf_counter() + interval
+        with placeholder.container():
+            draw_audio_monitor(monitor)
+        thread.join(max(0.0, deadline - time.perf_counter()))
+    placeholder.empty()
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome['result']
+
+
+@traced('listen_from_microphone')
+def listen_from_microphone(duration=5, language='en-US', latency_budget=None, live_view=False):
+    """Record from the microphone and queue the recording for transcription"""
+    import speech_recognition as sr
+    from audio_processing import audio_duration
+    from audio_monitor import AudioMonitor
+    from recognition import recognize_hedged, scale_budget
+    try:
+        monitor = AudioMonitor() if live_view else None
+        # Capture only needs the energy threshold, so no pooled engine is held
+        # while waiting on the microphone; one is leased by the job below
+        recognizer = sr.Recognizer()
+        with sr.Microphone() as source:
+            if monitor:
+                monitor.attach(source)
+            calibration = get_calibration_cache()
+            tracer = get_tracer()
+            with tracer.span('calibrate'):
+                calibration_time = calibration.prepare(recognizer, source)
+            if calibration_time:
+                add_log(f"Calibrated for ambient noise in {calibration_time:.2f}s", 'info', 'calibrate', calibration_time)
+            else:
+                add_log(f"Using cached noise calibration (threshold {recognizer.energy_threshold:.0f})", 'info', 'calibrate')
             
+            add_log(f"Listening for {duration} seconds...", 'info', 'listen')
             try:
-                text = recognizer.recognize_google(audio, language=language)
-                recognition_time = time.time() - start_time
-                
-                st.session_state.current_transcription = text
-                st.session_state.transcription_history.append({
-                    'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                    'text': text,
-                    'recognition_time': recognition_time,
-                    'source': 'microphone',
-                    'language': language
-                })
-                
-                update_stats(text, recognition_time)
-                add_log(f"Transcribed: {text}", 'success')
-                
-                return text
-                
-            except sr.UnknownValueError:
-                add_log("Could not understand audio", 'error')
-                return None
-            except sr.RequestError as e:
-                add_log(f"API Error: {e}", 'error')
-                return None
+                with tracer.span('listen'):
+                    listen = functools.partial(recognizer.listen, source, timeout=duration,
+                                               phrase_time_limit=duration)
+                    audio = run_with_live_view(listen, monitor) if monitor else listen()
+            finally:
+                # listen() adapts the threshold on the quiet frames before speech
+                calibration.update(None, recognizer.energy_threshold)
+        
+        add_log("Processing speech...", 'info', 'listen')
+        pool = get_engine_pool()
+        breaker = get_google_breaker()
+        language, choose = choose_language(language, 'microphone')
+        
+        def run(job):
+            with tracer.trace('job:listen_from_microphone', job_id=job.id):
+                start_time = time.time()
+                with pool.lease() as recognizer:
+                    chosen, detection = choose(recognizer, audio)
+                    with tracer.span('recognize', engine='google') as span:
+                        result = recognize_hedged(recognizer, audio, chosen,
+                                                  scale_budget(latency_budget, audio, LATENCY_BUDGET_AUDIO_SECONDS),
+                                                  breaker)
+                        span.set(answered_by=result['engine'])
+                return {
+                    'transcription': result['text'],
+                    'confidence': result['confidence'],
+                    'recognition_time': time.time() - start_time,
+                    'engine': result['engine'],
+                    'fallback_reason': result['fallback_reason'],
+                    'detection': detection
+                }
+        
+        return submit_job('microphone', run, 'google', label='microphone recording', source='microphone',
+                          language=language, engine='google', audio_duration=audio_duration(audio))
                 
     except Exception as e:
-        add_log(f"Microphone error: {e}", 'error')
+        add_log(f"Microphone error: {e}", 'error', 'listen')
         return None
 
 
-def compare_recognition_methods(audio_file):
+@traced('compare_recognition_methods')
+def compare_recognition_methods(audio_file, language='en-US', reference=None):
     """Compare different recognition methods"""
-    recognizer = sr.Recognizer()
+    from audio_processing import audio_duration
+    from recognition import BACKENDS, run_backends
     results = {}
     
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as tmp_file:
-            tmp_file.write(audio_file.getvalue())
-            tmp_file_path = tmp_file.name
+        tracer = get_tracer()
+        with tracer.span('decode'):
+            audio = get_decoded_audio(audio_file)
+        cache = get_result_cache()
+        language, choose = choose_language(language, audio_file.name)
+        keys = {method: cache_key(audio, language, method) for method in BACKENDS} if language != 'auto' else {}
         
-        with sr.AudioFile(tmp_file_path) as source:
-            audio = recognizer.record(source)
-            
-            # Google Speech Recognition
-            try:
-                start = time.time()
-                text = recognizer.recognize_google(audio)
-                time_taken = time.time() - start
-                results['Google'] = {
-                    'text': text,
-                    'time': time_taken,
-                    'status': '✅ Success'
-                }
-            except Exception as e:
-                results['Google'] = {'status': f'❌ Failed: {str(e)}'}
-            
-            # Sphinx (offline)
-            try:
-                start = time.time()
-                text = recognizer.recognize_sphinx(audio)
-                time_taken = time.time() - start
-                results['Sphinx (Offline)'] = {
-                    'text': text,
-                    'time': time_taken,
-                    'status': '✅ Success'
-                }
-            except Exception as e:
-                results['Sphinx (Offline)'] = {'status': f'❌ Failed: {str(e)}'}
+        # Engines that already transcribed this audio are answered from the cache
+        pending = []
+        for method in BACKENDS:
+            data = cache.get(keys[method]) if keys else None
+            if data is None:
+                pending.append(method)
+                continue
+            results[method] = dict(data, status='✅ Success (cached)')
+        
+        context = {'label': f"comparison of {audio_file.name}", 'source': audio_file.name, 'language': language,
+                   'audio_duration': audio_duration(audio), 'engine': 'comparison', 'reference': reference}
+        if not pending:
+            finish_comparison(context, results)
+            return None
+        
+        pool = get_engine_pool()
+        
+        # All remaining backends run concurrently; each one is published as it finishes
+        def run(job):
+            with tracer.trace('job:compare_recognition_methods', job_id=job.id), pool.lease() as recognizer:
+                compared = dict(results)
+                job.report(0.0, dict(compared))
+                chosen, _ = choose(recognizer, audio)
+                for method, data in run_backends(recognizer, audio, chosen, pending):
+                    compared[method] = data
+                    tracer.record(f"backend:{method}", data.get('time', 0), status=data['status'])
+                    if 'text' in data:
+                        cache.put(keys.get(method) or cache_key(audio, chosen, method), data)
+                    job.report((len(compared) - len(results)) / len(pending), dict(compared))
+                return compared
         
-        os.unlink(tmp_file_path)
-        return results
+        # Only a job that calls Google spends a Google rate-limit token
+        return submit_job('compare', run, 'google' if 'Google' in pending else None, **context)
         
     except Exception as e:
-        add_log(f"Comparison error: {e}", 'error')
+        add_log(f"Comparison error: {e}", 'error', 'compare')
         return None
 
 
+def finish_transcription(context, result):
+    """Record a finished transcription in the session (script thread only)"""
+    transcription = result['transcription']
+    language = known_language(context['language'], context['source'])
+    st.session_state.current_transcription = transcription
+    add_history({
+        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'text': transcription,
+        'confidence': result.get('confidence'),
+        'recognition_time': result['recognition_time'],
+        'source': context['source'],
+        'language': language
+    })
+    
+    job_id = context.get('job_id')
+    detection = result.get('detection')
+    if detection:
+        add_log(f"Identified {detection['language']} (confidence {detection['confidence']:.2f}) in "
+                f"{detection['time']:.2f}s; {len(detection['cancelled'])} of "
+                f"{len(detection['scores']) + len(detection['cancelled'])} candidates cancelled",
+                'info', 'language', detection['time'], job_id)
+    for error in result.get('errors', []):
+        add_log(f"API Error on {error}", 'error', 'recognize', job_id=job_id)
+    if result.get('first_segment_time') is not None:
+        add_log(f"First segment ready after {result['first_segment_time']:.2f}s", 'info', 'recognize',
+                result['first_segment_time'], job_id)
+    
+    engine = context['engine']
+    if result.get('fallback_reason'):
+        add_log(f"{result['fallback_reason']}, answered offline", 'info', 'recognize', job_id=job_id)
+        if result.get('engine') == 'sphinx':
+            engine = 'sphinx (fallback)'
+    
+    update_stats(transcription, result['recognition_time'], engine, language, context['audio_duration'])
+    add_log(f"Successfully transcribed: {transcription[:50]}...", 'success', 'recognize',
+            result['recognition_time'], job_id)
+    st.session_state.last_result = dict(result, kind=context['kind'])
+
+
+def finish_comparison(context, results):
+    """Record the per-backend outcome of a comparison (script thread only)"""
+    language = known_language(context['language'], context['source'])
+    for method, data in results.items():
+        if data['status'].endswith('(cached)') or data.get('unsupported'):
+            continue
+        if 'text' in data:
+            st.session_state.performance.record(method, language, data['time'], context['audio_duration'])
+        else:
+            st.session_state.performance.record(method, language, 0, success=False)
+    add_log(f"Compared {len(results)} recognition methods", 'success', 'compare', job_id=context.get('job_id'))
+    st.session_state.last_result = {'kind': 'compare', 'comparison': results, 'reference': context.get('reference')}
+
+
+def apply_job_result(context, job):
+    """Fold a finished job into the session state (script thread only)"""
+    import speech_recognition as sr
+    if job.state == 'cancelled':
+        add_log(f"Cancelled {context['label']}", 'info', 'queue', job_id=job.id)
+        return
+    if job.state == 'done':
+        timings = get_startup_timings()
+        if timings['first_request'] is None:
+            timings['first_request'] = {'seconds': job.finished - job.submitted,
+                                        'since_start': job.finished - timings['started']}
+            log_startup_timings()
+        if context['kind'] == 'compare':
+            finish_comparison(context, job.result)
+        else:
+            finish_transcription(context, job.result)
+        return
+    
+    recognition_time = job.finished - (job.started or job.finished)
+    record_failure(recognition_time, context['engine'], known_language(context['language'], context['source']))
+    if isinstance(job.error, sr.UnknownValueError):
+        message = context.get('not_understood', "Could not understand audio")
+    elif isinstance(job.error, sr.RequestError):
+        message = f"API Error: {job.error}"
+    else:
+        message = f"Error processing {context['label']}: {job.error}"
+    add_log(message, 'error', 'recognize', recognition_time, job.id)
+    st.session_state.last_result = {'error': message}
+
+
+def start_continuous_listening(language='en-US', phrase_time_limit=10, latency_budget=None, live_view=False):
+    """Start background capture and recognition of microphone phrases"""
+    from audio_monitor import AudioMonitor
+    from mic_pipeline import ContinuousListener
+    from recognition import recognize_hedged, scale_budget
+    pool = get_engine_pool()
+    scheduler = get_scheduler()
+    breaker = get_google_breaker()
+    session_id = st.session_state.session_id
+    # In auto mode the first phrase identifies the language and the rest reuse it
+    _, choose = choose_language(language, 'microphone')
+    
+    # Runs on the recognition thread, so it must not touch st.session_state;
+    # each phrase waits its turn on the shared scheduler like any other job
+    def recognize(audio):
+        def run(job):
+            with pool.lease() as recognizer:
+                chosen, _ = choose(recognizer, audio)
+                budget = scale_budget(latency_budget, audio, LATENCY_BUDGET_AUDIO_SECONDS)
+                return recognize_hedged(recognizer, audio, chosen, budget, breaker)['text']
+        return scheduler.wait(scheduler.submit(session_id, run, 'google', 'phrase'))
+    
+    listener = ContinuousListener(recognize, phrase_time_limit=phrase_time_limit,
+                                  calibration=get_calibration_cache(),
+                                  monitor=AudioMonitor() if live_view else None)
+    listener.start()
+    st.session_state.listener = listener
+    st.session_state.is_listening = True
+    add_log("Continuous listening started", 'info', 'continuous')
+
+
+def stop_continuous_listening():
+    """
+    Stop background capture without waiting for it
+
+    The listener stays in the session until live_transcript() has
+    collected the phrases that were still queued or being recognized.
+    """
+    listener = st.session_state.listener
+    if listener:
+        listener.stop()
+    st.session_state.is_listening = False
+    add_log("Stopping continuous listening, finishing the queued phrases", 'info', 'continuous')
+
+
+def collect_listener_results(language='en-US'):
+    """Move finished background transcriptions into the session transcript"""
+    listener = st.session_state.listener
+    if not listener:
+        return []
+    language = known_language(language, 'microphone')
+    
+    texts = []
+    for entry in listener.drain():
+        if entry['error'] or not entry['text']:
+            record_failure(entry['recognition_time'], 'google (continuous)', language)
+            if entry['error']:
+                add_log(f"API Error: {entry['error']}", 'error', 'continuous', entry['recognition_time'])
+            continue
+        texts.append(entry['text'])
+        add_history({
+            'timestamp': datetime.fromtimestamp(entry['timestamp']).strftime("%Y-%m-%d %H:%M:%S"),
+            'text': entry['text'],
+            'recognition_time': entry['recognition_time'],
+            'source': 'microphone (continuous)',
+            'language': language
+        })
+        update_stats(entry['text'], entry['recognition_time'], 'google (continuous)', language, entry['duration'])
+        add_log(f"Transcribed: {entry['text']}", 'success', 'continuous', entry['recognition_time'])
+    
+    if texts:
+        current = st.session_state.current_transcription
+        st.session_state.current_transcription = ' '.join([current] + texts if current else texts)
+    if listener.error:
+        add_log(f"Microphone error: {listener.error}", 'error', 'continuous')
+        listener.error = None
+    return texts
+
+
+def live_transcript(language='en-US'):
+    """
+    Collect the background listener's new phrases and show its status
+
+    A stopped listener is released once its threads have exited, i.e.
+    after the last queued phrase was recognized and collected.
+    """
+    listener = st.session_state.listener
+    if not listener:
+        return
+    # Checked before collecting, so a result appended in between is not lost
+    finished = not listener.running
+    collect_listener_results(language)
+    if finished and not st.session_state.is_listening:
+        st.session_state.listener = None
+        add_log("Continuous listening stopped", 'info', 'continuous')
+        return
+    
+    stats = listener.stats()
+    status = "🎧 Listening..." if st.session_state.is_listening else "⏳ Finishing..."
+    st.markdown(f"""
+    <div class="status-box status-listening">
+        {status} {stats['phrases']} phrases, {stats['queued']} waiting
+    </div>
+    """, unsafe_allow_html=True)
+
+
+@st.fragment(run_every=1 / LIVE_VIEW_FPS)
+def live_audio_view():
+    """Spectrogram and level of the continuous listener's microphone, redrawn at LIVE_VIEW_FPS"""
+    listener = st.session_state.listener
+    if listener and listener.monitor:
+        draw_audio_monitor(listener.monitor)
+
+
+# Seconds between background refreshes of the stats, history and log panels
+PANEL_REFRESH_SECONDS = 2
+
+
 # Main UI
 def main():
+    # Startup is timed from the first render of this server process
+    get_startup_timings()
+    
     # Header
-    st.markdown("""
-    <div class="main-header">
-        <h1>🎤 Advanced Speech-to-Text System</h1>
-        <p>Real-time voice transcription with multiple recognition methods</p>
-    </div>
-    """, unsafe_allow_html=True)
+    st.markdown(HEADER_HTML, unsafe_allow_html=True)
     
     # Sidebar
     with st.sidebar:
-        st.markdown("### ⚙️ Settings")
-        
-        # Language selection
-        language_options = {
-            'English (US)': 'en-US',
-            'English (UK)': 'en-GB',
-            'Spanish': 'es-ES',
-            'French': 'fr-FR',
-            'German': 'de-DE',
-            'Italian': 'it-IT',
-            'Hindi': 'hi-IN',
-            'Chinese (Simplified)': 'zh-CN',
-            'Japanese': 'ja-JP'
-        }
-        
-        selected_language = st.selectbox(
-            "🌐 Recognition Language",
-            options=list(language_options.keys()),
-            index=0
-        )
-        language_code = language_options[selected_language]
-        
-        st.markdown("---")
-        
-        # Recording duration
-        duration = st.slider("⏱️ Recording Duration (seconds)", 3, 30, 5)
-        
-        st.markdown("---")
-        
-        # Statistics
-        st.markdown("### 📊 Session Statistics")
-        st.metric("Total Words", st.session_state.stats['total_words'])
-        st.metric("Total Characters", st.session_state.stats['total_characters'])
-        st.metric("Total Time", f"{st.session_state.stats['recognition_time']:.1f}s")
-        
-        st.markdown("---")
-        
-        # Clear all data
-        if st.button("🗑️ Clear All Data", use_container_width=True):
-            st.session_state.transcription_history = []
-            st.session_state.current_transcription = ""
-            st.session_state.stats = {
-                'total_words': 0,
-                'total_characters': 0,
-                'recognition_time': 0,
-                'sessions': 0
-            }
-            st.session_state.activity_log = []
-            add_log("All data cleared", 'info')
-            st.rerun()
+        language_code, duration, segmented, max_workers, latency_budget, live_view = render_settings()
+        render_session_stats()
+        render_sidebar_actions()
+    
+    # Each panel is a fragment: interacting with one only reruns that panel,
+    # and the stats, history and log panels pick up changes on a timer
+    # instead of forcing a full-page rerun.
+    render_workspace(language_code, duration, segmented, max_workers, latency_budget, live_view)
+    render_stats()
+    
+    # History and Logs
+    st.markdown("---")
+    
+    tab1, tab2 = st.tabs(["📜 Transcription History", "📋 Activity Log"])
+    
+    with tab1:
+        render_history()
+    
+    with tab2:
+        render_log()
+    
+    # Engines load after the page is drawn, so the first paint doesn't wait for them
+    prewarm_engines(language_code if language_code != 'auto' else 'en-US')
+
+
+def render_settings():
+    """Sidebar settings; changing them reruns the whole page"""
+    st.markdown("### ⚙️ Settings")
+    
+    # Language selection
+    language_options = {
+        'English (US)': 'en-US',
+        'English (UK)': 'en-GB',
+        'Spanish': 'es-ES',
+        'French': 'fr-FR',
+        'German': 'de-DE',
+        'Italian': 'it-IT',
+        'Hindi': 'hi-IN',
+        'Chinese (Simplified)': 'zh-CN',
+        'Japanese': 'ja-JP',
+        'Auto-detect': 'auto'
+    }
+    
+    selected_language = st.selectbox(
+        "🌐 Recognition Language",
+        options=list(language_options.keys()),
+        index=0
+    )
+    language_code = language_options[selected_language]
+    if language_code == 'auto':
+        names = {code: name for name, code in language_options.items()}
+        options = list(dict.fromkeys([code for code in language_options.values() if code != 'auto'] + AUTO_LANGUAGES))
+        st.multiselect("🔍 Candidate Languages", options, default=AUTO_LANGUAGES, key='auto_languages',
+                       format_func=lambda code: names.get(code, code),
+                       help="Each recording or file is tried in these languages and the most confident one is used")
+    
+    st.markdown("---")
+    
+    # Recording duration
+    duration = st.slider("⏱️ Recording Duration (seconds)", 3, 30, 5)
+    
+    st.markdown("---")
+    
+    # Long file handling
+    segmented = st.checkbox("✂️ Segment Long Files", value=False,
+                            help="Split uploads on silence and transcribe the pieces in parallel")
+    max_workers = st.slider("🧵 Parallel Workers", 1, 8, 4, disabled=not segmented)
     
-    # Main content
+    st.markdown("---")
+    
+    # Latency-bounded recognition
+    fallback = st.checkbox("🛟 Offline Fallback", value=True,
+                           help="Race Sphinx against Google when Google hasn't answered within the budget")
+    latency_budget = st.slider("⏳ Latency Budget (seconds)", 0.5, 10.0, LATENCY_BUDGET, 0.5, disabled=not fallback)
+    breaker = get_google_breaker()
+    if breaker.state != 'closed':
+        st.warning(f"Google is failing; skipped for up to {breaker.cooldown:.0f}s")
+    
+    st.markdown("---")
+    
+    # Live view of the microphone input
+    live_view = st.checkbox("📈 Live Audio View", value=True,
+                            help="Show a scrolling spectrogram and input level while the microphone records")
+    
+    st.markdown("---")
+    
+    return language_code, duration, segmented, max_workers, latency_budget if fallback else None, live_view
+
+
+@st.fragment(run_every=PANEL_REFRESH_SECONDS)
+@traced('render_session_stats', standalone=False)
+def render_session_stats():
+    st.markdown("### 📊 Session Statistics")
+    st.metric("Total Words", st.session_state.stats['total_words'])
+    st.metric("Total Characters", st.session_state.stats['total_characters'])
+    st.metric("Total Time", f"{st.session_state.stats['recognition_time']:.1f}s")
+    st.metric("Requests", st.session_state.stats['requests'],
+              help="Recognition requests in this session, including failed ones")
+    cache_stats = get_result_cache().stats()
+    st.metric("Cache Hits / Misses", f"{cache_stats['hits']} / {cache_stats['misses']}")
+    job_stats = get_scheduler().stats()
+    st.metric("Server Jobs Running / Queued", f"{job_stats['running']} / {job_stats['queued']}",
+              help="Recognition jobs across all sessions")
+    
+    st.markdown("---")
+
+
+def render_sidebar_actions():
+    # Diagnostics
+    st.markdown("### 🔬 Diagnostics")
+    tracer = get_tracer()
+    profile = st.checkbox("Profile requests (cProfile)", value=tracer.profile)
+    track_memory = st.checkbox("Track memory (tracemalloc)", value=tracer.track_memory)
+    tracer.set_profiling(profile, track_memory)
+    
+    st.markdown("---")
+    
+    # Clear all data
+    if st.button("🗑️ Clear All Data", use_container_width=True):
+        # History stays in the durable store; a new session id starts an empty view
+        st.session_state.session_id = uuid.uuid4().hex
+        st.session_state.current_transcription = ""
+        st.session_state.stats = {
+            'total_words': 0,
+            'total_characters': 0,
+            'recognition_time': 0,
+            'transcriptions': 0,
+            'requests': 0
+        }
+        st.session_state.performance = PerformanceStats()
+        st.session_state.activity_log = new_activity_log()
+        st.session_state.last_result = None
+        add_log("All data cleared", 'info')
+        st.rerun()
+
+
+@st.fragment
+@traced('render_workspace')
+def render_workspace(language_code, duration, segmented, max_workers, latency_budget=None, live_view=False):
+    """Voice input controls and transcription output"""
     col1, col2 = st.columns([1, 1])
     
     with col1:
@@ -526,13 +1285,27 @@ def main():
         
         # Microphone recording
         st.markdown("#### Real-time Recording")
-        if st.button("🔴 Start Recording", use_container_width=True, type="primary"):
+        if st.button("🔴 Start Recording", use_container_width=True, type="primary",
+                     disabled=st.session_state.is_listening):
             with st.spinner(f"🎤 Recording for {duration} seconds..."):
-                result = listen_from_microphone(duration, language_code)
-                if result:
-                    st.success(f"✅ Transcription successful!")
+                if not listen_from_microphone(duration, language_code, latency_budget, live_view):
+                    st.error("❌ Recording failed. Please try again.")
+        
+        # Continuous listening
+        st.markdown("#### Continuous Listening")
+        if not st.session_state.is_listening:
+            if st.button("🎧 Start Listening", use_container_width=True):
+                if st.session_state.listener:
+                    st.warning("⏳ Still transcribing the last phrases, please try again in a moment")
                 else:
-                    st.error("❌ Transcription failed. Please try again.")
+                    start_continuous_listening(language_code, duration, latency_budget, live_view)
+                    st.rerun()
+        else:
+            if st.button("⏹️ Stop Listening", use_container_width=True):
+                stop_continuous_listening()
+                st.rerun()
+            if st.session_state.listener.monitor:
+                live_audio_view()
         
         st.markdown("---")
         
@@ -541,153 +1314,267 @@ def main():
         uploaded_file = st.file_uploader(
             "Choose an audio file (WAV, MP3, OGG)",
             type=['wav', 'mp3', 'ogg', 'flac'],
-            help="Upload an audio file to transcribe"
+            help="Upload an audio file to transcribe (MP3 and OGG need ffmpeg on the server)"
         )
         
         if uploaded_file is not None:
             st.audio(uploaded_file, format=f'audio/{uploaded_file.name.split(".")[-1]}')
+            reference = st.text_area("📄 Reference Transcript (optional)", key="reference_text",
+                                     help="What is actually said in the file; comparisons then report WER/CER")
             
             col_a, col_b = st.columns(2)
             
             with col_a:
                 if st.button("🔄 Transcribe File", use_container_width=True):
-                    with st.spinner("Processing audio file..."):
-                        result = process_audio_file(uploaded_file, language_code)
-                        if result:
-                            st.success("✅ File processed successfully!")
-                            
-                            # Show confidence if available
-                            if 'confidence' in result:
-                                st.progress(result['confidence'], text=f"Confidence: {result['confidence']*100:.1f}%")
-                            
-                            # Show alternatives
-                            if 'alternatives' in result and result['alternatives']:
-                                with st.expander("🔄 Alternative Transcriptions"):
-                                    for i, alt in enumerate(result['alternatives'], 1):
-                                        st.write(f"{i}. {alt.get('transcript', '')}")
-                        else:
-                            st.error("❌ Failed to process file")
+                    process_audio_file(uploaded_file, language_code, segmented, max_workers, latency_budget)
             
             with col_b:
                 if st.button("🔬 Compare Methods", use_container_width=True):
-                    with st.spinner("Comparing recognition methods..."):
-                        comparison = compare_recognition_methods(uploaded_file)
-                        if comparison:
-                            st.success("✅ Comparison complete!")
-                            
-                            # Display comparison
-                            st.markdown("#### 📊 Method Comparison")
-                            for method, data in comparison.items():
-                                st.markdown(f"**{method}**: {data.get('status', 'Unknown')}")
-                                if 'time' in data:
-                                    st.write(f"⏱️ Time: {data['time']:.2f}s")
-                                if 'text' in data:
-                                    st.write(f"📝 Text: {data['text'][:100]}...")
-                                st.markdown("---")
+                    compare_recognition_methods(uploaded_file, language_code, reference.strip() or None)
     
     with col2:
-        st.markdown("### 📝 Transcription Output")
+        render_output(language_code)
+
+
+def clear_transcription():
+    st.session_state.current_transcription = ""
+
+
+@st.fragment(run_every=1)
+def render_output(language_code='en-US'):
+    """
+    Job progress and transcription output, polled every second
+
+    Finished jobs and new continuous-listening phrases are applied here
+    before anything is drawn, so a result shows up without rerunning the
+    rest of the page.
+    """
+    st.markdown("### 📝 Transcription Output")
+    
+    # Queued and running jobs are polled; the outcome of the latest one stays below
+    if st.session_state.jobs:
+        render_jobs()
+    live_transcript(language_code)
+    render_last_result()
+    
+    # Current transcription display
+    if st.session_state.current_transcription:
+        st.markdown(f"""
+        <div class="transcription-box">
+            {st.session_state.current_transcription}
+        </div>
+        """, unsafe_allow_html=True)
         
-        # Current transcription display
-        if st.session_state.current_transcription:
-            st.markdown(f"""
-            <div class="transcription-box">
-                {st.session_state.current_transcription}
-            </div>
-            """, unsafe_allow_html=True)
-            
-            # Action buttons
-            col_x, col_y, col_z = st.columns(3)
-            with col_x:
-                if st.button("📋 Copy Text", use_container_width=True):
-                    st.code(st.session_state.current_transcription, language=None)
-            with col_y:
-                if st.button("💾 Save to File", use_container_width=True):
-                    filename = f"transcription_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
-                    st.download_button(
-                        "⬇️ Download",
-                        st.session_state.current_transcription,
-                        filename,
-                        "text/plain",
-                        use_container_width=True
-                    )
-            with col_z:
-                if st.button("🗑️ Clear", use_container_width=True):
-                    st.session_state.current_transcription = ""
-                    st.rerun()
+        # Action buttons; they stay open across the timed reruns
+        col_x, col_y, col_z = st.columns(3)
+        with col_x:
+            with st.popover("📋 Copy Text", use_container_width=True):
+                st.code(st.session_state.current_transcription, language=None)
+        with col_y:
+            st.download_button(
+                "💾 Save to File",
+                st.session_state.current_transcription,
+                f"transcription_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt",
+                "text/plain",
+                key="save_transcription",
+                on_click="ignore",
+                use_container_width=True
+            )
+        with col_z:
+            st.button("🗑️ Clear", use_container_width=True, on_click=clear_transcription)
+    else:
+        st.info("💡 No transcription yet. Start recording or upload an audio file to begin!")
+
+
+def show_comparison(results, reference=None):
+    """One block per recognition method, with accuracy when a reference transcript is given"""
+    scored = [method for method, data in results.items() if 'text' in data]
+    from scoring import score_batch
+    scores = score_batch([reference] * len(scored), [results[method]['text'] for method in scored]) \
+        if reference and scored else None
+    for method, data in results.items():
+        st.markdown(f"**{method}**: {data.get('status', 'Unknown')}")
+        if 'time' in data:
+            st.write(f"⏱️ Time: {data['time']:.2f}s")
+        if scores is not None and method in scored:
+            i = scored.index(method)
+            if not scores['ref_words'][i]:
+                st.write("🎯 Reference is empty after normalization, so there is nothing to score")
+            else:
+                st.write(f"🎯 WER: {scores['wer'][i] * 100:.1f}% · CER: {scores['cer'][i] * 100:.1f}% · "
+                         f"Accuracy: {scores['accuracy'][i] * 100:.1f}% "
+                         f"({scores['substitutions'][i]} sub, {scores['deletions'][i]} del, "
+                         f"{scores['insertions'][i]} ins)")
+        if 'text' in data:
+            st.write(f"📝 Text: {data['text'][:100]}...")
+        st.markdown("---")
+
+
+def render_jobs():
+    """Apply this session's finished jobs and show the progress of the others"""
+    scheduler = get_scheduler()
+    for job_id, context in list(st.session_state.jobs.items()):
+        job = scheduler.get(job_id)
+        if job is None or job.done:
+            del st.session_state.jobs[job_id]
+            if job is not None:
+                apply_job_result(context, job)
+            continue
+        
+        if job.state == 'queued':
+            col_a, col_b = st.columns([4, 1])
+            col_a.progress(0.0, text=f"⏳ {context['label']}: queued, {scheduler.position(job_id)} ahead")
+            if col_b.button("Cancel", key=f"cancel_{job_id}"):
+                scheduler.cancel(job_id)
         else:
-            st.info("💡 No transcription yet. Start recording or upload an audio file to begin!")
+            st.progress(job.progress, text=f"⚙️ {context['label']}: running for {time.time() - job.started:.1f}s")
+            if isinstance(job.partial, dict):
+                show_comparison(job.partial, context.get('reference'))
+            elif job.partial:
+                st.markdown(job.partial)
+
+
+def render_last_result():
+    """Details of the most recent file, recording or comparison result"""
+    result = st.session_state.last_result
+    if not result:
+        return
+    if 'error' in result:
+        st.error(f"❌ {result['error']}")
+        return
+    
+    if result['kind'] == 'compare':
+        st.markdown("#### 📊 Method Comparison")
+        show_comparison(result['comparison'], result.get('reference'))
+        st.success("✅ Comparison complete!")
+        return
+    
+    st.success("✅ Transcription successful!")
+    
+    # Show confidence if available
+    if result.get('confidence') is not None:
+        st.progress(result['confidence'], text=f"Confidence: {result['confidence']*100:.1f}%")
     
+    # Show alternatives
+    if result.get('alternatives'):
+        with st.expander("🔄 Alternative Transcriptions"):
+            for i, alt in enumerate(result['alternatives'], 1):
+                st.write(f"{i}. {alt.get('transcript', '')}")
+    
+    # Show per-segment timestamps
+    if 'segments' in result:
+        from recognition import format_timestamp
+        with st.expander(f"✂️ Segments ({len(result['segments'])})"):
+            for seg in result['segments']:
+                st.write(f"[{format_timestamp(seg['start'])} - {format_timestamp(seg['end'])}] {seg['text'] or '…'}")
+
+
+@st.fragment(run_every=PANEL_REFRESH_SECONDS)
+@traced('render_stats', standalone=False)
+def render_stats():
     # Statistics cards
     st.markdown("### 📊 Quick Stats")
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        st.markdown("""
-        <div class="stat-card">
-            <div class="stat-value">{}</div>
-            <div class="stat-label">Words</div>
-        </div>
-        """.format(st.session_state.stats['total_words']), unsafe_allow_html=True)
+        st.markdown(STAT_CARD_HTML.format(st.session_state.stats['total_words'], "Words"),
+                    unsafe_allow_html=True)
     
     with col2:
-        st.markdown("""
-        <div class="stat-card">
-            <div class="stat-value">{}</div>
-            <div class="stat-label">Characters</div>
-        </div>
-        """.format(st.session_state.stats['total_characters']), unsafe_allow_html=True)
+        st.markdown(STAT_CARD_HTML.format(st.session_state.stats['total_characters'], "Characters"),
+                    unsafe_allow_html=True)
     
     with col3:
-        st.markdown("""
-        <div class="stat-card">
-            <div class="stat-value">{}</div>
-            <div class="stat-label">Transcriptions</div>
-        </div>
-        """.format(len(st.session_state.transcription_history)), unsafe_allow_html=True)
+        st.markdown(STAT_CARD_HTML.format(st.session_state.stats['transcriptions'], "Transcriptions"),
+                    unsafe_allow_html=True)
+    
+    performance = st.session_state.performance.overall()
     
     with col4:
-        avg_time = (st.session_state.stats['recognition_time'] / len(st.session_state.transcription_history) 
-                   if st.session_state.transcription_history else 0)
-        st.markdown("""
-        <div class="stat-card">
-            <div class="stat-value">{:.1f}s</div>
-            <div class="stat-label">Avg Time</div>
-        </div>
-        """.format(avg_time), unsafe_allow_html=True)
+        # Mean over successful recognitions only; failures are counted separately
+        avg_time = performance['latency'].mean
+        st.markdown(STAT_CARD_HTML.format(f"{avg_time:.1f}s", "Avg Time"), unsafe_allow_html=True)
     
-    # History and Logs
-    st.markdown("---")
+    # Latency distribution per engine and language
+    with st.expander("⚡ Performance Details"):
+        latency = performance['latency'].summary()
+        if latency['count']:
+            col_a, col_b, col_c, col_d = st.columns(4)
+            col_a.metric("p50 Latency", f"{latency['p50']:.2f}s")
+            col_b.metric("p95 Latency", f"{latency['p95']:.2f}s")
+            col_c.metric("p99 Latency", f"{latency['p99']:.2f}s")
+            col_d.metric("Real-Time Factor", f"{performance['rtf'].mean:.2f}")
+        if st.session_state.performance.groups:
+            st.table(st.session_state.performance.rows())
+        else:
+            st.info("No recognitions yet")
     
-    tab1, tab2 = st.tabs(["📜 Transcription History", "📋 Activity Log"])
+    # Stage timings of the previous script run
+    last_trace = st.session_state.get('last_trace')
+    if last_trace:
+        with st.expander(f"⏱️ Last Request Trace ({last_trace.duration * 1000:.0f} ms)"):
+            st.table([{'Stage': span['name'], 'Parent': span['parent'] or '',
+                       'Duration (ms)': round(span['duration'] * 1000, 1)} for span in last_trace.spans])
+            if last_trace.peak_memory is not None:
+                st.write(f"🧠 Peak traced memory: {last_trace.peak_memory / 1024:.0f} KiB")
+            if last_trace.profile:
+                st.code(last_trace.profile, language=None)
+
+
+@st.fragment(run_every=PANEL_REFRESH_SECONDS)
+@traced('render_history', standalone=False)
+def render_history():
+    history = get_history_store()
+    col_a, col_b = st.columns([3, 1])
+    with col_a:
+        search = st.text_input("🔍 Search transcripts", key="history_search")
+    with col_b:
+        all_sessions = st.checkbox("All sessions", key="history_all_sessions")
+    filters = {'search': search or None,
+               'session_id': None if all_sessions else st.session_state.session_id}
     
-    with tab1:
-        if st.session_state.transcription_history:
-            for i, entry in enumerate(reversed(st.session_state.transcription_history[-10:]), 1):
-                with st.expander(f"🔹 {entry['timestamp']} - {entry.get('source', 'Unknown')}"):
-                    st.write(f"**Text:** {entry['text']}")
-                    col_a, col_b = st.columns(2)
-                    with col_a:
-                        if 'confidence' in entry:
-                            st.write(f"🎯 Confidence: {entry['confidence']*100:.1f}%")
-                        st.write(f"⏱️ Time: {entry.get('recognition_time', 0):.2f}s")
-                    with col_b:
-                        st.write(f"🌐 Language: {entry.get('language', 'N/A')}")
-                        st.write(f"📊 Words: {len(entry['text'].split())}")
-        else:
-            st.info("No transcription history yet")
+    # Only the visible page is read from the store
+    total = history.count(**filters)
+    page_size = 10
+    pages = max(1, (total + page_size - 1) // page_size)
+    page = st.number_input("Page", min_value=1, max_value=pages, value=1, key="history_page") if pages > 1 else 1
+    entries = history.page((page - 1) * page_size, page_size, **filters)
     
-    with tab2:
-        if st.session_state.activity_log:
-            for log in reversed(st.session_state.activity_log):
-                st.markdown(f"""
-                <div class="log-entry {log['type']}">
-                    <strong>[{log['timestamp']}]</strong> {log['message']}
-                </div>
-                """, unsafe_allow_html=True)
-        else:
-            st.info("No activity logs yet")
+    if entries:
+        st.caption(f"Showing {(page - 1) * page_size + 1}-{(page - 1) * page_size + len(entries)} of {total}")
+        for i, entry in enumerate(entries, 1):
+            with st.expander(f"🔹 {entry['timestamp']} - {entry.get('source') or 'Unknown'}"):
+                st.write(f"**Text:** {entry['text']}")
+                col_a, col_b = st.columns(2)
+                with col_a:
+                    if entry.get('confidence') is not None:
+                        st.write(f"🎯 Confidence: {entry['confidence']*100:.1f}%")
+                    st.write(f"⏱️ Time: {entry.get('recognition_time') or 0:.2f}s")
+                with col_b:
+                    st.write(f"🌐 Language: {entry.get('language') or 'N/A'}")
+                    st.write(f"📊 Words: {len(entry['text'].split())}")
+    elif search:
+        st.info("No transcriptions match your search")
+    else:
+        st.info("No transcription history yet")
+
+
+@st.fragment(run_every=PANEL_REFRESH_SECONDS)
+@traced('render_log', standalone=False)
+def render_log():
+    log_startup_timings()
+    if st.session_state.activity_log:
+        # One HTML block for the whole log instead of one element per entry
+        st.markdown("\n".join(
+            LOG_ENTRY_HTML.format(f"log-{event['level']}", event['time'], event['message'])
+            for event in reversed(st.session_state.activity_log.events)
+        ), unsafe_allow_html=True)
+    else:
+        st.info("No activity logs yet")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # Each script run (initial load or rerun) is one traced request
+    with get_tracer().trace('rerun') as run:
+        main()
+    st.session_state.last_trace = getattr(run, 'trace', None)
\ No newline at end of file
@@ -0,0 +1,211 @@
+import threading
+import time
+from collections import deque
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+# Anchor colours of the spectrogram palette, from the floor (dark) to the ceiling (bright)
+PALETTE = np.array([[0, 0, 4], [59, 15, 112], [140, 41, 129], [222, 73, 104], [254, 159, 109], [252, 253, 191]],
+                   dtype=np.float64)
+
+
+def _lut(palette, size=256):
+    """size x 3 uint8 colour table interpolated between the palette anchors"""
+    positions = np.linspace(0, len(palette) - 1, size)
+    anchors = np.arange(len(palette))
+    return np.stack([np.interp(positions, anchors, palette[:, c]) for c in range(3)], axis=1).astype(np.uint8)
+
+
+COLORS = _lut(PALETTE)
+
+
+class StreamingSpectrogram:
+    """
+    Short-time power spectrum of a sample stream, kept as a scrolling image
+
+    process() frames whatever samples it is given into Hann-windowed
+    n_fft windows every hop samples (half overlap by default), keeping the
+    unfinished tail for the next call, and runs one batched rfft over all
+    new frames (the DFT of the Lab2 notebook, for many windows at once).
+    The bins up to max_freq are max-pooled into n_bands rows, and each
+    frame overwrites the oldest of the columns image columns in place, so
+    the cost per call only depends on the new audio.
+    """
+
+    def __init__(self, sample_rate, n_fft=None, hop=None, n_bands=64, columns=200,
+                 max_freq=8000.0, floor_db=-100.0):
+        self.sample_rate = sample_rate
+        # About 32 ms windows, rounded to a power of two
+        self.n_fft = n_fft or 1 << int(round(np.log2(sample_rate * 0.032)))
+        self.hop = hop or self.n_fft // 2
+        self.window = np.hanning(self.n_fft)
+        self.floor_db = floor_db
+        # Full-scale sine at the window's coherent gain is 0 dB
+        self._scale = 1.0 / (self.window.sum() / 2) ** 2
+
+        n_bins = min(self.n_fft // 2 + 1, int(max_freq * self.n_fft / sample_rate) + 1)
+        self.n_bands = min(n_bands, n_bins)
+        self.max_freq = (n_bins - 1) * sample_rate / self.n_fft
+        self._n_bins = n_bins
+        self._edges = np.linspace(0, n_bins, self.n_bands + 1).astype(np.int64)[:-1]
+
+        self._image = np.full((columns, self.n_bands), floor_db, dtype=np.float32)
+        self._next = 0
+        self._pending = np.zeros(0)
+        self.frames = 0
+
+    def process(self, samples):
+        """Add samples (floats in [-1, 1]) and return how many new columns they completed"""
+        x = np.concatenate([self._pending, samples]) if len(self._pending) else np.asarray(samples, dtype=np.float64)
+        n_frames = max(0, (len(x) - self.n_fft) // self.hop + 1)
+        self._pending = x[n_frames * self.hop:].copy()
+        if not n_frames:
+            return 0
+
+        frames = sliding_window_view(x, self.n_fft)[::self.hop][:n_frames] * self.window
+        spectrum = np.fft.rfft(frames, axis=1)[:, :self._n_bins]
+        power = spectrum.real ** 2 + spectrum.imag ** 2
+        bands = np.maximum.reduceat(power, self._edges, axis=1) * self._scale
+        db = 10 * np.log10(np.maximum(bands, 10 ** (self.floor_db / 10)))
+
+        columns = len(self._image)
+        db = db[-columns:]
+        rows = (self._next + np.arange(len(db))) % columns
+        self._image[rows] = db
+        self._next = (self._next + len(db)) % columns
+        self.frames += n_frames
+        return n_frames
+
+    def image(self):
+        """(bands, columns) dB array, oldest column first and lowest band at the bottom"""
+        return np.roll(self._image, -self._next, axis=0).T[::-1]
+
+    def rgb(self, floor_db=-90.0, ceil_db=-10.0):
+        """image() as a uint8 RGB array for display"""
+        scaled = (self.image() - floor_db) * (255.0 / (ceil_db - floor_db))
+        return COLORS[np.clip(scaled, 0, 255).astype(np.uint8)]
+
+
+class LevelMeter:
+    """
+    RMS and peak level in dBFS with a decaying peak hold
+
+    Levels are taken over the samples of each process() call; the held
+    peak falls by decay_db_per_second once newer blocks are quieter.
+    """
+
+    def __init__(self, decay_db_per_second=20.0, floor_db=-100.0):
+        self.decay = decay_db_per_second
+        self.floor_db = floor_db
+        self.rms_db = floor_db
+        self.peak_db = floor_db
+        self.hold_db = floor_db
+        self.clipped = 0
+        self._updated = time.monotonic()
+
+    def _db(self, value):
+        return max(self.floor_db, float(20 * np.log10(value))) if value > 0 else self.floor_db
+
+    def process(self, samples):
+        now = time.monotonic()
+        self.hold_db = max(self.floor_db, self.hold_db - self.decay * (now - self._updated))
+        self._updated = now
+        if not len(samples):
+            return
+        peak = float(np.abs(samples).max())
+        self.rms_db = self._db(float(np.sqrt(np.dot(samples, samples) / len(samples))))
+        self.peak_db = self._db(peak)
+        self.hold_db = max(self.hold_db, self.peak_db)
+        if peak >= 0.999:
+            self.clipped += 1
+
+    def levels(self):
+        return {'rms_db': self.rms_db, 'peak_db': self.peak_db, 'hold_db': self.hold_db, 'clipped': self.clipped}
+
+
+class _TappedStream:
+    """Audio source stream wrapper that hands every chunk read to a callback"""
+
+    def __init__(self, stream, on_read):
+        self.stream = stream
+        self.on_read = on_read
+
+    def read(self, size):
+        data = self.stream.read(size)
+        self.on_read(data)
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+class AudioMonitor:
+    """
+    Live spectrogram and level meter fed from a capture stream
+
+    attach() wraps an open sr.Microphone (or any AudioSource) so every
+    chunk the recognizer reads is also copied here. The capture thread only
+    appends raw bytes to a deque; the analysis runs in update(), called by
+    whoever draws the view at its own frame rate, so capture never waits
+    on it. When the drawing side falls more than max_pending seconds
+    behind, the oldest audio is skipped (counted in skipped).
+    """
+
+    def __init__(self, n_bands=64, columns=200, max_pending=2.0, **spectrogram_options):
+        self.n_bands = n_bands
+        self.columns = columns
+        self.max_pending = max_pending
+        self.spectrogram_options = spectrogram_options
+        self.spectrogram = None
+        self.meter = LevelMeter()
+        self.sample_rate = None
+        self.sample_width = None
+        self.seconds = 0.0
+        self.skipped = 0
+        self._chunks = deque()
+        self._pending_bytes = 0
+        self._lock = threading.Lock()
+
+    def attach(self, source):
+        """Start copying the chunks read from source's stream; call inside its with block"""
+        if self.spectrogram is None or self.sample_rate != source.SAMPLE_RATE:
+            self.sample_rate = source.SAMPLE_RATE
+            self.spectrogram = StreamingSpectrogram(source.SAMPLE_RATE, n_bands=self.n_bands,
+                                                    columns=self.columns, **self.spectrogram_options)
+        self.sample_width = source.SAMPLE_WIDTH
+        source.stream = _TappedStream(source.stream, self.feed)
+        return source
+
+    def feed(self, data):
+        """Queue raw little-endian PCM from the capture thread"""
+        limit = int(self.max_pending * self.sample_rate * self.sample_width)
+        with self._lock:
+            self._chunks.append(data)
+            self._pending_bytes += len(data)
+            while self._pending_bytes > limit and len(self._chunks) > 1:
+                self._pending_bytes -= len(self._chunks.popleft())
+                self.skipped += 1
+
+    def update(self):
+        """Analyze the audio fed since the last call; returns the current levels"""
+        with self._lock:
+            chunks = list(self._chunks)
+            self._chunks.clear()
+            self._pending_bytes = 0
+        if chunks and self.spectrogram is not None:
+            data = b''.join(chunks)
+            width = self.sample_width
+            samples = np.frombuffer(data[:len(data) - len(data) % width], dtype=f'<i{width}')
+            samples = samples / float(1 << (8 * width - 1))
+            self.seconds += len(samples) / self.sample_rate
+            self.spectrogram.process(samples)
+            self.meter.process(samples)
+        elif not chunks:
+            self.meter.process(np.zeros(0))
+        return self.meter.levels()
+
+    def rgb(self):
+        """Current spectrogram image, or None before any audio was attached"""
+        return self.spectrogram.rgb() if self.spectrogram is not None else None
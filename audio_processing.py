@@ -0,0 +1,381 @@
+import io
+import math
+import shutil
+import subprocess
+import threading
+import wave
+
+import numpy as np
+import speech_recognition as sr
+
+
+# Sample rate the recognizers are fed; the bundled Sphinx models and Google both work at 16 kHz
+TARGET_RATE = 16000
+
+# Seconds of source audio decoded and resampled per block
+BLOCK_SECONDS = 2.0
+
+
+class StreamingResampler:
+    """
+    Block-wise polyphase resampler
+
+    The prototype low-pass filter is a Kaiser-windowed sinc designed at
+    orig_rate * up, split into `up` phases. Each output sample picks its
+    phase and dots it with the preceding input samples, vectorized over
+    all outputs in a block. Filter history is carried between blocks, so
+    audio of any length is resampled with memory bounded by one block.
+    """
+
+    def __init__(self, orig_rate, target_rate, zero_crossings=16, rolloff=0.95, beta=8.0):
+        g = math.gcd(orig_rate, target_rate)
+        self.up = target_rate // g
+        self.down = orig_rate // g
+        self.taps = int(math.ceil(zero_crossings * max(1.0, self.down / self.up)))
+
+        length = self.taps * self.up
+        cutoff = rolloff * 0.5 / max(self.up, self.down)
+        # Centre the filter on a multiple of `down` so the delay is a whole number of output samples
+        center = int(round((length - 1) / 2 / self.down)) * self.down
+        n = np.arange(length) - center
+        half = max(center, length - 1 - center)
+        window = np.i0(beta * np.sqrt(np.clip(1 - (n / half) ** 2, 0, None))) / np.i0(beta)
+        h = 2 * cutoff * np.sinc(2 * cutoff * n) * window
+        h *= self.up / h.sum()
+        # phases[p, k] = h[p + k * up]
+        self.phases = h.reshape(self.taps, self.up).T.astype(np.float32)
+
+        # Output sample m lines up with input sample m * down / up once the filter delay is skipped
+        self._skip = center // self.down
+        self._history = np.zeros(self.taps - 1, dtype=np.float32)
+        self._consumed = 0
+        self._next_out = 0
+        self._emitted = 0
+
+    def process(self, x):
+        """Resample the next block of input; returns the outputs it completes"""
+        if self.up == self.down:
+            return np.asarray(x, dtype=np.float32)
+        buf = np.concatenate([self._history, np.asarray(x, dtype=np.float32)])
+        buf_start = self._consumed - (self.taps - 1)
+        self._consumed += len(x)
+        self._history = buf[len(buf) - (self.taps - 1):]
+
+        # Every output whose newest input sample has now arrived
+        last = (self._consumed * self.up - 1) // self.down
+        m = np.arange(self._next_out, last + 1)
+        self._next_out = last + 1
+        if not len(m):
+            return np.zeros(0, dtype=np.float32)
+
+        q = m * self.down
+        newest = q // self.up - buf_start
+        window = buf[newest[:, None] - np.arange(self.taps)[None, :]]
+        y = np.einsum('ij,ij->i', self.phases[q % self.up], window)
+
+        if self._emitted < self._skip:
+            drop = min(self._skip - self._emitted, len(y))
+            self._emitted += drop
+            y = y[drop:]
+        return y
+
+    def flush(self):
+        """Push the filter tail out so the output length matches the input duration"""
+        if self.up == self.down:
+            return np.zeros(0, dtype=np.float32)
+        expected = int(math.ceil(self._consumed * self.up / self.down))
+        produced = self._next_out - self._skip
+        tail = self.process(np.zeros(self.taps, dtype=np.float32))
+        return tail[:max(0, expected - produced)]
+
+
+def _soundfile_blocks(data):
+    """(sample_rate, channels, block iterator) via libsndfile (WAV, FLAC, OGG, AIFF, MP3)"""
+    import soundfile as sf
+
+    f = sf.SoundFile(data)
+
+    def blocks():
+        with f:
+            for block in f.blocks(blocksize=int(f.samplerate * BLOCK_SECONDS), dtype='float32', always_2d=True):
+                yield block
+    return f.samplerate, f.channels, blocks()
+
+
+def _wave_blocks(data):
+    """(sample_rate, channels, block iterator) for PCM WAV with the standard library"""
+    f = wave.open(data, 'rb')
+    rate, channels, width = f.getframerate(), f.getnchannels(), f.getsampwidth()
+
+    def blocks():
+        with f:
+            while True:
+                raw = f.readframes(int(rate * BLOCK_SECONDS))
+                if not raw:
+                    return
+                audio = sr.AudioData(raw, rate, width)
+                yield audio_data_to_array(audio).reshape(-1, channels)
+    return rate, channels, blocks()
+
+
+def _ffmpeg_blocks(data):
+    """
+    (sample_rate, channels, block iterator) piped through ffmpeg for anything else (MP3, OGG, ...)
+
+    ffmpeg converts the upload to 16-bit WAV on a pipe: a feeder thread
+    writes the upload to its stdin while _wave_blocks() reads its stdout,
+    so no more than one block of decoded audio is held at a time.
+    """
+    ffmpeg = shutil.which('ffmpeg')
+    if not ffmpeg:
+        raise RuntimeError("MP3/OGG uploads need ffmpeg on the PATH (or the soundfile package)")
+    process = subprocess.Popen([ffmpeg, '-v', 'error', '-i', 'pipe:0', '-map', '0:a:0', '-acodec', 'pcm_s16le',
+                                '-f', 'wav', 'pipe:1'],
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def feed():
+        try:
+            for chunk in iter(lambda: data.read(64 * 1024), b''):
+                process.stdin.write(chunk)
+        except OSError:
+            # ffmpeg exited early; its exit status is reported below
+            pass
+        finally:
+            try:
+                process.stdin.close()
+            except OSError:
+                pass
+
+    def finish(kill):
+        if kill and process.poll() is None:
+            process.kill()
+        process.stdout.close()
+        error = process.stderr.read().decode('utf-8', 'replace').strip()
+        process.stderr.close()
+        process.wait()
+        return error or f"exit status {process.returncode}"
+
+    threading.Thread(target=feed, name='ffmpeg-feed', daemon=True).start()
+    try:
+        rate, channels, wav_blocks = _wave_blocks(process.stdout)
+    except Exception:
+        raise ValueError(f"ffmpeg could not decode the audio ({finish(kill=True)})")
+
+    def blocks():
+        complete = False
+        try:
+            yield from wav_blocks
+            complete = True
+        finally:
+            # An abandoned iterator kills ffmpeg instead of leaving it blocked on the pipe
+            error = finish(kill=not complete)
+        if process.returncode:
+            raise ValueError(f"ffmpeg could not decode the audio ({error})")
+    return rate, channels, blocks()
+
+
+def _open_blocks(data):
+    """(sample_rate, channels, block iterator) from the first decoder that accepts the data"""
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        data = io.BytesIO(data)
+    start = data.tell()
+
+    errors = []
+    for decoder in (_soundfile_blocks, _wave_blocks, None, _ffmpeg_blocks):
+        data.seek(start)
+        try:
+            if decoder is None:
+                # AIFF/FLAC through speech_recognition (already mono)
+                with sr.AudioFile(data) as source:
+                    audio = sr.Recognizer().record(source)
+                return audio.sample_rate, 1, iter([audio_data_to_array(audio)[:, None]])
+            return decoder(data)
+        except Exception as e:
+            errors.append(e)
+    raise ValueError(f"Unsupported or corrupt audio file ({errors[-1]})")
+
+
+def _downmix(block):
+    return block.mean(axis=1) if block.shape[1] > 1 else block[:, 0]
+
+
+def stream_audio(data, target_rate=TARGET_RATE):
+    """
+    Decode an upload block by block as mono float32 at target_rate
+
+    Same decoders as load_audio(), but yields each resampled block instead
+    of collecting the whole file, so long recordings can be analyzed with
+    bounded memory.
+    """
+    rate, _, blocks = _open_blocks(data)
+    resampler = StreamingResampler(rate, target_rate or rate, zero_crossings=16)
+    for block in blocks:
+        yield resampler.process(_downmix(block))
+    yield resampler.flush()
+
+
+def load_audio(data, target_rate=TARGET_RATE):
+    """
+    Decode any supported upload to 16-bit mono PCM at target_rate
+
+    Decoding goes through soundfile when it is installed, then the
+    standard-library wave module, sr.AudioFile (AIFF/FLAC) and finally an
+    ffmpeg pipe (MP3/OGG). Both soundfile and ffmpeg are optional: without
+    either of them only WAV, AIFF and FLAC uploads can be read. Blocks are
+    downmixed and resampled as they are decoded, so only the 16 kHz mono
+    result is kept in full (the sr.AudioFile fallback decodes the whole
+    file first). data may be bytes, a memoryview or a seekable binary file
+    object (a Streamlit UploadedFile is read in place without a temp file).
+
+    Returns: (sr.AudioData, info dict with source rate/channels and payload sizes)
+    """
+    rate, channels, blocks = _open_blocks(data)
+    resampler = StreamingResampler(rate, target_rate or rate, zero_crossings=16)
+    out = bytearray()
+    source_frames = 0
+    for block in blocks:
+        source_frames += len(block)
+        out += _to_pcm16(resampler.process(_downmix(block)))
+    out += _to_pcm16(resampler.flush())
+
+    info = {
+        'source_rate': rate,
+        'source_channels': channels,
+        'duration': source_frames / rate,
+        # Payload the recognizer would have been sent as 16-bit PCM without downmix/resample
+        'source_bytes': source_frames * channels * 2,
+        'bytes': len(out),
+    }
+    return sr.AudioData(bytes(out), target_rate or rate, 2), info
+
+
+def _to_pcm16(samples):
+    return (np.clip(samples, -1.0, 1.0) * 32767).astype('<i2').tobytes()
+
+
+def decode_audio(data, target_rate=TARGET_RATE):
+    """Decode an upload to an sr.AudioData at target_rate (see load_audio)"""
+    return load_audio(data, target_rate)[0]
+
+
+def audio_duration(audio):
+    """Length of an sr.AudioData in seconds"""
+    return len(audio.frame_data) / (audio.sample_rate * audio.sample_width)
+
+
+def audio_data_to_array(audio):
+    """Convert the raw PCM of an sr.AudioData into a float32 array in [-1, 1]"""
+    width = audio.sample_width
+    raw = audio.get_raw_data()
+    if width == 1:
+        # 8-bit WAV is unsigned
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif width == 3:
+        # 24-bit: pad each sample to 32 bits and reuse the int32 path
+        packed = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3)
+        padded = np.zeros((len(packed), 4), dtype=np.uint8)
+        padded[:, 1:] = packed
+        samples = padded.view('<i4').ravel().astype(np.float32) / 2 ** 31
+    else:
+        dtype = {2: '<i2', 4: '<i4'}[width]
+        samples = np.frombuffer(raw, dtype=dtype).astype(np.float32) / 2 ** (8 * width - 1)
+    return samples
+
+
+def frame_energy_db(samples, frame_len):
+    """Mean energy (dB) of consecutive non-overlapping frames"""
+    n_frames = len(samples) // frame_len
+    frames = samples[:n_frames * frame_len].reshape(n_frames, frame_len)
+    return 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+
+
+def split_on_silence(samples, sample_rate, frame_ms=30, min_silence_ms=300,
+                     max_segment_s=15.0, threshold_db=None):
+    """
+    Energy-based voice activity detection
+
+    Cuts the signal in the middle of every pause of at least min_silence_ms and
+    splits anything still longer than max_segment_s at its quietest frame.
+    Segments that contain no speech frames at all are dropped.
+
+    Returns: list of (start_sample, end_sample) tuples
+    """
+    frame_len = max(1, int(sample_rate * frame_ms / 1000))
+    energy = frame_energy_db(samples, frame_len)
+    if len(energy) == 0:
+        return [(0, len(samples))] if len(samples) else []
+
+    if threshold_db is None:
+        # Halfway (in dB) between the noise floor and the loud speech frames
+        floor = np.percentile(energy, 10)
+        peak = np.percentile(energy, 95)
+        threshold_db = floor + 0.5 * (peak - floor)
+    silent = energy < threshold_db
+
+    # Locate runs of silent frames and cut at the centre of the long ones
+    padded = np.concatenate(([False], silent, [False])).astype(np.int8)
+    edges = np.diff(padded)
+    run_starts = np.flatnonzero(edges == 1)
+    run_ends = np.flatnonzero(edges == -1)
+    min_silence = max(1, int(min_silence_ms / frame_ms))
+    long_runs = (run_ends - run_starts) >= min_silence
+    cuts = ((run_starts[long_runs] + run_ends[long_runs]) // 2).tolist()
+
+    bounds = [0] + [c for c in cuts if 0 < c < len(energy)] + [len(energy)]
+    max_frames = max(2, int(max_segment_s * 1000 / frame_ms))
+
+    segments = []
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        while end - start > max_frames:
+            # Split inside the second half of the window so pieces stay reasonably long
+            lo = start + max_frames // 2
+            cut = lo + int(np.argmin(energy[lo:start + max_frames]))
+            segments.append((start, cut))
+            start = cut
+        segments.append((start, end))
+
+    result = []
+    for start, end in segments:
+        if end > start and not silent[start:end].all():
+            end_sample = len(samples) if end == len(energy) else end * frame_len
+            result.append((start * frame_len, end_sample))
+    return result
+
+
+def _mel_filterbank(sample_rate, n_fft, n_mels):
+    """Triangular mel filters as an (n_mels, n_fft // 2 + 1) matrix"""
+    mel = np.linspace(0, 2595 * np.log10(1 + sample_rate / 2 / 700), n_mels + 2)
+    bins = np.floor((n_fft + 1) * 700 * (10 ** (mel / 2595) - 1) / sample_rate).astype(int)
+    fb = np.zeros((n_mels, n_fft // 2 + 1), dtype=np.float32)
+    for m in range(n_mels):
+        lo, center, hi = bins[m], bins[m + 1], bins[m + 2]
+        fb[m, lo:center] = (np.arange(lo, center) - lo) / max(center - lo, 1)
+        fb[m, center:hi] = (hi - np.arange(center, hi)) / max(hi - center, 1)
+    return fb
+
+
+def mfcc(samples, sample_rate, n_mfcc=13, n_mels=26, frame_ms=25, hop_ms=10, preemphasis=0.97):
+    """
+    MFCCs of a float signal as a (frames, n_mfcc) array
+
+    Pre-emphasis, Hamming-windowed frames, mel filterbank energies and an
+    orthonormal DCT; cepstral means are removed so recordings made at
+    different levels compare under DTW (see dtw.TemplateIndex).
+    """
+    x = np.asarray(samples, dtype=np.float32)
+    x = np.append(x[:1], x[1:] - preemphasis * x[:-1])
+    frame_len = int(sample_rate * frame_ms / 1000)
+    hop = int(sample_rate * hop_ms / 1000)
+    if len(x) < frame_len:
+        x = np.pad(x, (0, frame_len - len(x)))
+    n_fft = 1 << (frame_len - 1).bit_length()
+
+    frames = np.lib.stride_tricks.sliding_window_view(x, frame_len)[::hop] * np.hamming(frame_len).astype(np.float32)
+    power = np.abs(np.fft.rfft(frames, n_fft)) ** 2 / n_fft
+    log_mel = np.log(power @ _mel_filterbank(sample_rate, n_fft, n_mels).T + 1e-10)
+
+    k = np.arange(n_mels)
+    dct = np.cos(np.pi / n_mels * (k + 0.5) * np.arange(n_mfcc)[:, None]) * np.sqrt(2 / n_mels)
+    dct[0] /= np.sqrt(2)
+    coeffs = log_mel @ dct.T
+    return coeffs - coeffs.mean(axis=0)
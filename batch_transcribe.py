@@ -0,0 +1,202 @@
+"""
+Headless batch transcription
+
+Transcribes every audio file in a directory (or listed in a manifest) on a
+process pool and streams one JSON line per file to the output as soon as it
+finishes. Files already present in the output are skipped, so an
+interrupted run can be resumed with the same command and the output keeps
+one record per file. With --retry-failed, files whose record is
+"unrecognized" or "error" are transcribed again and a new record is
+appended; the last record for a path is the one that counts.
+
+Example:
+    python batch_transcribe.py recordings/ -o transcripts.jsonl --engine sphinx --workers 8
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import speech_recognition as sr
+
+from audio_processing import load_audio
+from engine_pool import WarmRecognizer
+from recognition import recognize_best, segment_audio, transcribe_segments
+
+
+AUDIO_EXTENSIONS = ('.wav', '.flac', '.aiff', '.aif', '.mp3', '.ogg')
+
+# One warm recognizer per worker process, built by the pool initializer
+_recognizer = None
+
+
+def find_audio_files(source):
+    """List audio files under a directory, or the paths in a manifest file"""
+    if os.path.isdir(source):
+        paths = []
+        for root, _, files in os.walk(source):
+            for name in files:
+                if name.lower().endswith(AUDIO_EXTENSIONS):
+                    paths.append(os.path.join(root, name))
+        return sorted(paths)
+
+    # Manifest: one path per line, or JSON lines with a "path" field
+    base = os.path.dirname(os.path.abspath(source))
+    paths = []
+    with open(source, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            path = json.loads(line)['path'] if line.startswith('{') else line
+            paths.append(path if os.path.isabs(path) else os.path.join(base, path))
+    return paths
+
+
+def completed_paths(output_path, retry_failed=False):
+    """
+    Paths with a record in an existing output file
+
+    With retry_failed, only paths whose last record is "ok" count as done.
+    """
+    statuses = {}
+    if not os.path.exists(output_path):
+        return set()
+    with open(output_path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A line cut short by an interrupted run
+                continue
+            statuses[record['path']] = record.get('status')
+    return {path for path, status in statuses.items() if status == 'ok' or not retry_failed}
+
+
+def _init_worker(preload):
+    global _recognizer
+    _recognizer = WarmRecognizer(preload=preload)
+
+
+def transcribe_path(path, language='en-US', engine='google', segment=False):
+    """Transcribe one file in a worker process and return its JSONL record"""
+    record = {'path': path, 'engine': engine, 'language': language,
+              'text': None, 'confidence': None, 'alternatives': [], 'status': 'ok', 'error': None}
+    start = time.time()
+    try:
+        with open(path, 'rb') as f:
+            audio, info = load_audio(f)
+        record['duration'] = info['duration']
+        record['source_rate'] = info['source_rate']
+        record['payload_bytes'] = info['bytes']
+        record['decode_time'] = time.time() - start
+
+        recognize_start = time.time()
+        if segment:
+            segments = segment_audio(audio)
+            recognize = lambda segment_audio_data: recognize_best(_recognizer, segment_audio_data, language, engine)
+            pieces = [entry for entry in transcribe_segments(segments, recognize, max_workers=1) if entry['text']]
+            if not pieces:
+                raise sr.UnknownValueError()
+            record['text'] = ' '.join(entry['text'] for entry in pieces)
+            record['segments'] = [{key: entry[key] for key in ('start', 'end', 'text', 'confidence')}
+                                  for entry in pieces]
+        else:
+            record['text'], record['confidence'], record['alternatives'] = recognize_best(
+                _recognizer, audio, language, engine
+            )
+        record['recognition_time'] = time.time() - recognize_start
+    except sr.UnknownValueError:
+        record['status'] = 'unrecognized'
+    except sr.RequestError as e:
+        record['status'] = 'error'
+        record['error'] = f"API Error: {e}"
+    except Exception as e:
+        record['status'] = 'error'
+        record['error'] = str(e)
+    record['total_time'] = time.time() - start
+    return record
+
+
+def run_batch(paths, output_path, language='en-US', engine='google', workers=None, segment=False, log=print):
+    """Transcribe paths on a process pool, appending records to output_path as they finish"""
+    workers = workers or os.cpu_count() or 1
+    pending_paths = iter(paths)
+    counts = {'ok': 0, 'unrecognized': 0, 'error': 0}
+    start = time.time()
+
+    # Make sure a partially written last line doesn't swallow the first new record
+    if os.path.exists(output_path) and os.path.getsize(output_path):
+        with open(output_path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            needs_newline = f.read(1) != b'\n'
+    else:
+        needs_newline = False
+
+    # Only a Sphinx run needs a decoder loaded up front, and only for its own language
+    preload = (language,) if engine == 'sphinx' else ()
+    with open(output_path, 'a', encoding='utf-8') as out, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(preload,)) as pool:
+        if needs_newline:
+            out.write('\n')
+        running = set()
+
+        def submit_next():
+            path = next(pending_paths, None)
+            if path is not None:
+                running.add(pool.submit(transcribe_path, path, language, engine, segment))
+
+        # Keep a couple of files queued per worker without loading the whole list up front
+        for _ in range(2 * workers):
+            submit_next()
+
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                running.remove(future)
+                record = future.result()
+                out.write(json.dumps(record, ensure_ascii=False) + '\n')
+                out.flush()
+                counts[record['status']] += 1
+                log(f"[{record['status']}] {record['path']} ({record['total_time']:.2f}s)")
+                submit_next()
+
+    counts['elapsed'] = time.time() - start
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch transcription of audio files to JSONL")
+    parser.add_argument('source', help="directory of audio files or a manifest (one path or JSON object per line)")
+    parser.add_argument('-o', '--output', default='transcripts.jsonl', help="JSONL output file (appended to)")
+    parser.add_argument('--engine', choices=['google', 'sphinx'], default='google')
+    parser.add_argument('--language', default='en-US')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument('--segment', action='store_true', help="split long files on silence before recognition")
+    parser.add_argument('--no-resume', action='store_true', help="transcribe files that are already in the output")
+    parser.add_argument('--retry-failed', action='store_true',
+                        help="on resume, transcribe files recorded as unrecognized or error again")
+    args = parser.parse_args(argv)
+
+    paths = find_audio_files(args.source)
+    if not args.no_resume:
+        done = completed_paths(args.output, args.retry_failed)
+        if done:
+            print(f"Resuming: skipping {len(done)} files already in {args.output}")
+        paths = [path for path in paths if path not in done]
+
+    if not paths:
+        print("Nothing to transcribe")
+        return 0
+
+    print(f"Transcribing {len(paths)} files with {args.engine} on {args.workers} workers")
+    counts = run_batch(paths, args.output, args.language, args.engine, args.workers, args.segment)
+    print(f"Done in {counts['elapsed']:.1f}s: {counts['ok']} ok, "
+          f"{counts['unrecognized']} unrecognized, {counts['error']} errors")
+    return 1 if counts['error'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,593 @@
+"""
+Recognition benchmark
+
+Runs the app's own request handlers (process_audio_file, whole-file and
+segmented, compare_recognition_methods and listen_from_microphone) over a
+fixed corpus from N concurrent clients. Each client is a Streamlit session
+driven through streamlit.testing.v1.AppTest, so requests go through the
+same decode, result cache, language choice, latency budget, rate limit and
+shared scheduler as in the app; the microphone is replaced by a replay of
+each file's first phrase. Google is replaced by a local HTTP stand-in with
+configurable delay, slow tail and failure rate, so runs are offline and
+reproducible. The corpus is synthetic (seeded) unless a directory or
+manifest of real recordings is given.
+
+Later iterations over the corpus are answered from the app's result cache,
+as repeated uploads are; use --iterations 1 to time uncached requests only.
+
+Latency percentiles, real-time factor, throughput and peak RSS per
+scenario are written to a JSON file; --baseline compares them against an
+earlier run and exits non-zero on regressions beyond --tolerance.
+
+Example:
+    python benchmark.py -o baseline.json --clients 4
+    python benchmark.py -o current.json --clients 4 --baseline baseline.json
+"""
+import argparse
+import io
+import json
+import logging
+import os
+import platform
+import queue
+import random
+import sys
+import tempfile
+import threading
+import time
+import wave
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import speech_recognition as sr
+
+from audio_processing import load_audio
+from recognition import slice_audio
+from session_stats import StreamingStats
+
+
+SCENARIOS = ('file', 'segmented', 'compare', 'microphone')
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '2448518_lab3.py')
+
+# Recording length passed to listen_from_microphone; replayed phrases are shorter
+MICROPHONE_SECONDS = 5
+
+# Metrics compared against a baseline, and whether a higher value is better
+COMPARED_METRICS = (
+    ('latency_p50', False), ('latency_p95', False), ('latency_p99', False),
+    ('rtf_mean', False), ('throughput', True), ('peak_rss_mb', False),
+)
+
+STAND_IN_WORDS = ('the', 'quick', 'brown', 'fox', 'speech', 'signal', 'model', 'frame', 'audio', 'test')
+
+
+class GoogleStandIn:
+    """
+    Local HTTP server answering like the Google Web Speech API
+
+    Every request waits `delay` seconds (plus up to +/- `jitter`); a
+    `slow_rate` fraction waits `slow_delay` instead, and a `failure_rate`
+    fraction is answered with HTTP 503. Transcripts are derived from the
+    request body, so the same audio always gets the same text.
+    """
+
+    def __init__(self, delay=0.25, jitter=0.1, failure_rate=0.0, slow_rate=0.0, slow_delay=5.0, seed=0):
+        self.delay = delay
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.slow_rate = slow_rate
+        self.slow_delay = slow_delay
+        self.requests = 0
+        self.failures = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def endpoint(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/speech-api/v2/recognize"
+
+    def _plan(self):
+        """(seconds to wait, whether to fail) for the next request"""
+        with self._lock:
+            self.requests += 1
+            fail = self._random.random() < self.failure_rate
+            self.failures += fail
+            if self._random.random() < self.slow_rate:
+                return self.slow_delay, fail
+            return max(0.0, self.delay + self._random.uniform(-self.jitter, self.jitter)), fail
+
+    def start(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                delay, fail = stand_in._plan()
+                time.sleep(delay)
+                if fail:
+                    self.send_error(503)
+                    return
+                words = [STAND_IN_WORDS[b % len(STAND_IN_WORDS)] for b in body[-8:]]
+                result = {'result': [{'alternative': [{'transcript': ' '.join(words), 'confidence': 0.9}],
+                                      'final': True}], 'result_index': 0}
+                payload = ('{"result":[]}\n' + json.dumps(result) + '\n').encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name='google-stand-in', daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+
+def synthetic_speech(duration, rng, sample_rate=44100):
+    """Speech-like float signal: harmonic syllables with short gaps and longer pauses"""
+    out = np.zeros(int(duration * sample_rate), dtype=np.float32)
+    pos = int(rng.uniform(0.1, 0.3) * sample_rate)
+    syllables = 0
+    while pos < len(out):
+        length = int(rng.uniform(0.12, 0.3) * sample_rate)
+        t = np.arange(min(length, len(out) - pos)) / sample_rate
+        f0 = rng.uniform(100, 220)
+        tone = sum(np.sin(2 * np.pi * f0 * k * t) / k for k in range(1, 6))
+        out[pos:pos + len(t)] = 0.3 * tone * np.hanning(len(t))
+        syllables += 1
+        pos += length + int(rng.uniform(0.03, 0.08) * sample_rate)
+        # Pause between phrases, long enough for the silence splitter
+        if syllables % 6 == 0:
+            pos += int(rng.uniform(0.4, 0.7) * sample_rate)
+    out += rng.normal(0, 0.003, len(out)).astype(np.float32)
+    return out
+
+
+def synthetic_corpus(count=8, seed=0, min_seconds=2.0, max_seconds=12.0, sample_rate=44100):
+    """Seeded list of stereo 44.1 kHz WAV recordings, like a typical upload"""
+    rng = np.random.default_rng(seed)
+    corpus = []
+    for i in range(count):
+        samples = synthetic_speech(rng.uniform(min_seconds, max_seconds), rng, sample_rate)
+        pcm = (np.clip(samples, -1, 1) * 32767).astype('<i2')
+        buffer = io.BytesIO()
+        with wave.open(buffer, 'wb') as f:
+            f.setnchannels(2)
+            f.setsampwidth(2)
+            f.setframerate(sample_rate)
+            f.writeframes(np.repeat(pcm, 2).tobytes())
+        corpus.append({'name': f'synthetic_{i:02d}.wav', 'data': buffer.getvalue()})
+    return corpus
+
+
+def load_corpus(source):
+    """Read real recordings from a directory or manifest"""
+    from batch_transcribe import find_audio_files
+    corpus = []
+    for path in find_audio_files(source):
+        with open(path, 'rb') as f:
+            corpus.append({'name': os.path.basename(path), 'data': f.read()})
+    return corpus
+
+
+def _rss_bytes():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class PeakRSS:
+    """Samples resident memory on a background thread while active"""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak = None
+        self._stop = threading.Event()
+
+    def _sample(self):
+        while True:
+            rss = _rss_bytes()
+            if rss is not None:
+                self.peak = max(self.peak or 0, rss)
+            if self._stop.wait(self.interval):
+                return
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._sample, name='rss-sampler', daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+
+class ReplayMicrophone(sr.AudioSource):
+    """
+    Stands in for sr.Microphone: a second of silence, then the phrase set
+    for the current thread in ReplayMicrophone.phrase.audio, then silence
+
+    The leading silence is what the app's ambient-noise calibration hears.
+    """
+
+    phrase = threading.local()
+
+    def __init__(self, device_index=None, sample_rate=None, chunk_size=1024):
+        audio = self.phrase.audio
+        self.SAMPLE_RATE = audio.sample_rate
+        self.SAMPLE_WIDTH = audio.sample_width
+        self.CHUNK = chunk_size
+        self._data = bytes(audio.sample_rate * audio.sample_width) + audio.frame_data
+        self.stream = None
+
+    def __enter__(self):
+        self.stream = _ReplayStream(self._data, self.SAMPLE_WIDTH)
+        return self
+
+    def __exit__(self, *exc):
+        self.stream = None
+        return False
+
+
+class _ReplayStream:
+    """Reads frames like a PyAudio stream, padding with silence once the data runs out"""
+
+    def __init__(self, data, sample_width):
+        self._data = data
+        self._sample_width = sample_width
+        self._pos = 0
+
+    def read(self, frames):
+        size = frames * self._sample_width
+        chunk = self._data[self._pos:self._pos + size]
+        self._pos += size
+        return chunk + bytes(size - len(chunk))
+
+
+class Upload(io.BytesIO):
+    """A corpus file shaped like Streamlit's UploadedFile"""
+
+    def __init__(self, item):
+        super().__init__(item['data'])
+        self.name = item['name']
+        self.file_id = item['name']
+        self.size = len(item['data'])
+
+
+def serve_request(app, timeout=None):
+    """
+    Script side of a benchmark session: run the pending request through the app
+
+    app is the namespace of the app module, executed without rendering the
+    page. The request in st.session_state.bench_request is handed to the
+    app's handler, its job is waited for and applied by render_jobs() as on
+    the next rerun, and the outcome is left in st.session_state.bench_outcome.
+    """
+    st = app['st']
+    request = st.session_state.pop('bench_request', None)
+    if request is None:
+        return
+    scenario, item, language, budget = request['scenario'], request['item'], request['language'], request['budget']
+    st.session_state.last_result = None
+    if scenario == 'microphone':
+        sr.Microphone = ReplayMicrophone
+        ReplayMicrophone.phrase.audio = item['phrase']
+        job_id = app['listen_from_microphone'](MICROPHONE_SECONDS, language, budget)
+    elif scenario == 'compare':
+        job_id = app['compare_recognition_methods'](Upload(item), language)
+    else:
+        job_id = app['process_audio_file'](Upload(item), language, segmented=scenario == 'segmented',
+                                           latency_budget=budget)
+
+    job = app['get_scheduler']().get(job_id) if job_id is not None else None
+    if job is not None:
+        try:
+            job.wait(timeout)
+        except Exception:
+            pass
+        app['render_jobs']()
+
+    result = st.session_state.last_result
+    if isinstance(getattr(job, 'error', None), sr.UnknownValueError):
+        outcome = {'status': 'unrecognized'}
+    elif not result:
+        errors = [event['message'] for event in st.session_state.activity_log if event['level'] == 'error']
+        outcome = {'status': 'error', 'error': errors[-1] if errors else "No result"}
+    elif 'error' in result:
+        outcome = {'status': 'error', 'error': result['error']}
+    elif scenario == 'compare' and not any('text' in data for data in result['comparison'].values()):
+        outcome = {'status': 'unrecognized'}
+    else:
+        outcome = {'status': 'ok'}
+    st.session_state.bench_outcome = outcome
+
+
+def _session_script(app_path, timeout):
+    # Runs as the Streamlit script of each benchmark session (see AppTest.from_function)
+    import runpy
+
+    from benchmark import serve_request
+    serve_request(runpy.run_path(app_path, run_name='benchmark_app'), timeout)
+
+
+class Bench:
+    """One request function per scenario, each client being its own app session"""
+
+    def __init__(self, language='en-US', budget=3.0, timeout=300):
+        self.language = language
+        self.budget = budget
+        self.timeout = timeout
+        self._sessions = {}
+        # Client threads touch session state outside a script run, which Streamlit warns about on every request
+        logging.getLogger('streamlit.runtime.scriptrunner_utils.script_run_context').addFilter(
+            lambda record: 'missing ScriptRunContext' not in record.getMessage())
+
+    def _session(self, session_id):
+        from streamlit.testing.v1 import AppTest
+        app = self._sessions.get(session_id)
+        if app is None:
+            app = AppTest.from_function(_session_script, args=(APP_PATH, self.timeout),
+                                        default_timeout=self.timeout)
+            # The first run initializes the session, like loading the page
+            app.run()
+            self._sessions[session_id] = app
+        return app
+
+    def _request(self, scenario, item, session_id):
+        app = self._session(session_id)
+        app.session_state['bench_request'] = {'scenario': scenario, 'item': item,
+                                              'language': self.language, 'budget': self.budget}
+        app.run()
+        if app.exception:
+            raise RuntimeError(app.exception[0].message)
+        outcome = app.session_state['bench_outcome']
+        if outcome['status'] == 'unrecognized':
+            raise sr.UnknownValueError()
+        if outcome['status'] == 'error':
+            raise RuntimeError(outcome['error'])
+
+    def file(self, item, session_id):
+        self._request('file', item, session_id)
+
+    def segmented(self, item, session_id):
+        self._request('segmented', item, session_id)
+
+    def compare(self, item, session_id):
+        self._request('compare', item, session_id)
+
+    def microphone(self, item, session_id):
+        # A spoken phrase: the first few seconds of the file, replayed to the app's microphone path
+        self._request('microphone', item, session_id)
+
+
+def configure_app(endpoint, engines, clients, google_rate, history_db):
+    """
+    Point the app at the stand-in and size it like the command line asks
+
+    Must run before the app or engine_pool is first imported, since both
+    read their settings from the environment at import time.
+    """
+    os.environ.update({
+        'STT_GOOGLE_ENDPOINT': endpoint,
+        'STT_ENGINE_POOL_SIZE': str(engines),
+        'STT_JOB_WORKERS': str(engines),
+        'STT_JOB_QUEUE_SIZE': str(2 * clients),
+        'STT_JOBS_PER_SESSION': '2',
+        'STT_GOOGLE_RATE': str(google_rate),
+        'STT_HISTORY_DB': history_db,
+        'STT_EVENT_LOG': '',
+    })
+
+
+def run_scenario(work, corpus, clients=4, iterations=2, warmup=1, duration_key='duration'):
+    """
+    Call work(item, session_id) over the corpus from `clients` threads
+
+    Each client is its own scheduler session. RTF and audio throughput are
+    computed from item[duration_key], the seconds of audio work actually
+    processes. Returns the summary dict for the scenario.
+    """
+    for item in corpus[:warmup]:
+        try:
+            work(item, 'warmup')
+        except Exception:
+            pass
+
+    requests = queue.Queue()
+    for _ in range(iterations):
+        for item in corpus:
+            requests.put(item)
+    latency, rtf = StreamingStats(), StreamingStats()
+    counts = {'ok': 0, 'unrecognized': 0, 'error': 0}
+    errors = {}
+    lock = threading.Lock()
+
+    def client(session_id):
+        while True:
+            try:
+                item = requests.get_nowait()
+            except queue.Empty:
+                return
+            start = time.perf_counter()
+            status, error = 'ok', None
+            try:
+                work(item, session_id)
+            except sr.UnknownValueError:
+                status = 'unrecognized'
+            except Exception as e:
+                status, error = 'error', f"{type(e).__name__}: {e}"
+            elapsed = time.perf_counter() - start
+            with lock:
+                counts[status] += 1
+                if error:
+                    errors[error] = errors.get(error, 0) + 1
+                if status != 'error':
+                    latency.add(elapsed)
+                    rtf.add(elapsed / item[duration_key])
+
+    threads = [threading.Thread(target=client, args=(f'client-{i}',), daemon=True) for i in range(clients)]
+    start = time.perf_counter()
+    with PeakRSS() as memory:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    wall = time.perf_counter() - start
+
+    summary = latency.summary()
+    requests_done = sum(counts.values())
+    return {
+        'requests': requests_done, **counts,
+        'errors': dict(sorted(errors.items(), key=lambda kv: -kv[1])[:5]),
+        'wall_time': round(wall, 3),
+        'throughput': round(requests_done / wall, 3) if wall else None,
+        'audio_seconds_per_second': round(sum(item[duration_key] for item in corpus) * iterations / wall, 3),
+        **{f'latency_{key}': round(summary[key], 4) for key in ('mean', 'min', 'p50', 'p95', 'p99', 'max') if key in summary},
+        'rtf_mean': round(rtf.mean, 4) if rtf.count else None,
+        'rtf_p95': round(rtf.summary()['p95'], 4) if rtf.count else None,
+        'peak_rss_mb': round(memory.peak / 2 ** 20, 1) if memory.peak else None,
+    }
+
+
+def compare_to_baseline(results, baseline, tolerance=0.10):
+    """Per-metric change against a baseline run; `regressed` marks changes worse than tolerance"""
+    rows = []
+    for scenario, current in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(scenario)
+        if not previous:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS:
+            old, new = previous.get(metric), current.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            rows.append({
+                'scenario': scenario, 'metric': metric, 'baseline': old, 'current': new,
+                'change': round(change, 4),
+                'regressed': change < -tolerance if higher_is_better else change > tolerance,
+            })
+    return rows
+
+
+def run_benchmark(args, stand_in):
+    """Load the corpus and run every requested scenario; None if the corpus is empty"""
+    corpus = load_corpus(args.corpus) if args.corpus else synthetic_corpus(args.files, args.seed)
+    if not corpus:
+        print("No audio files found")
+        return None
+    for item in corpus:
+        audio, info = load_audio(item['data'])
+        item['duration'] = info['duration']
+        phrase_end = min(len(audio.frame_data) // audio.sample_width, 3 * audio.sample_rate)
+        item['phrase'] = slice_audio(audio, 0, phrase_end)
+        item['phrase_duration'] = phrase_end / audio.sample_rate
+    print(f"Corpus: {len(corpus)} files, {sum(item['duration'] for item in corpus):.1f}s of audio")
+
+    results = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'args': vars(args),
+            'corpus': {'files': len(corpus), 'audio_seconds': round(sum(item['duration'] for item in corpus), 2)},
+        },
+        'scenarios': {},
+    }
+
+    bench = Bench(args.language, None if args.no_fallback else args.budget)
+    for name in args.scenarios:
+        print(f"Running {name} with {args.clients} clients...")
+        # The microphone scenario only recognizes each file's first phrase
+        duration_key = 'phrase_duration' if name == 'microphone' else 'duration'
+        scenario = run_scenario(getattr(bench, name), corpus, args.clients, args.iterations,
+                                duration_key=duration_key)
+        results['scenarios'][name] = scenario
+        print(f"  {scenario['requests']} requests, p50 {scenario.get('latency_p50', 0):.3f}s, "
+              f"p95 {scenario.get('latency_p95', 0):.3f}s, RTF {scenario['rtf_mean'] or 0:.3f}, "
+              f"{scenario['throughput']} req/s, peak RSS {scenario['peak_rss_mb']} MB, "
+              f"{scenario['error']} errors")
+    results['meta']['stand_in'] = {'requests': stand_in.requests, 'failures': stand_in.failures}
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the recognition paths against a local Google stand-in")
+    parser.add_argument('-o', '--output', default='benchmark.json', help="JSON results file")
+    parser.add_argument('--baseline', help="earlier results file to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.10, help="relative change counted as a regression")
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--corpus', help="directory or manifest of recordings (default: synthetic)")
+    parser.add_argument('--files', type=int, default=8, help="synthetic corpus size")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--clients', type=int, default=4, help="concurrent clients")
+    parser.add_argument('--iterations', type=int, default=2, help="passes over the corpus per scenario")
+    parser.add_argument('--engines', type=int, default=2, help="warm engines (and scheduler workers)")
+    parser.add_argument('--language', default='en-US')
+    parser.add_argument('--budget', type=float, default=3.0, help="latency budget before the Sphinx fallback")
+    parser.add_argument('--no-fallback', action='store_true', help="wait for Google only")
+    parser.add_argument('--delay', type=float, default=0.25, help="stand-in response delay (s)")
+    parser.add_argument('--jitter', type=float, default=0.1, help="stand-in delay jitter (s)")
+    parser.add_argument('--slow-rate', type=float, default=0.0, help="fraction of stand-in requests that are slow")
+    parser.add_argument('--slow-delay', type=float, default=5.0, help="delay of slow stand-in requests (s)")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="fraction of stand-in requests that fail")
+    parser.add_argument('--google-rate', type=float, default=0,
+                        help="the app's Google requests per second limit (0 = unlimited)")
+    args = parser.parse_args(argv)
+
+    # The app reads its settings at import, so the stand-in has to be up first
+    with GoogleStandIn(args.delay, args.jitter, args.failure_rate, args.slow_rate, args.slow_delay,
+                       args.seed) as stand_in, tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as scratch:
+        configure_app(stand_in.endpoint, args.engines, args.clients, args.google_rate,
+                      os.path.join(scratch, 'history.db'))
+        results = run_benchmark(args, stand_in)
+    if results is None:
+        return 1
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            rows = compare_to_baseline(results, json.load(f), args.tolerance)
+        results['baseline_comparison'] = {'baseline': args.baseline, 'tolerance': args.tolerance, 'metrics': rows}
+        for row in rows:
+            flag = 'REGRESSED' if row['regressed'] else ''
+            print(f"{row['scenario']:>10} {row['metric']:<13} {row['baseline']:>10} -> {row['current']:>10} "
+                  f"({row['change'] * 100:+.1f}%) {flag}")
+        if any(row['regressed'] for row in rows):
+            exit_code = 1
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,328 @@
+import heapq
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def as_frames(x, features_first=False):
+    """
+    A sequence as a (frames, features) float array
+
+    1-D sequences (the Lab6 vectors) become one feature per frame. Pass
+    features_first=True for (features, frames) arrays such as librosa's
+    MFCC output used in Lab7.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    if x.ndim == 1:
+        return x[:, None]
+    return x.T if features_first else x
+
+
+def band(n, m, window=None):
+    """
+    Sakoe-Chiba band for an n x m alignment, as per-row column ranges
+
+    Row i may use columns lo[i]..hi[i], within `window` frames of the
+    diagonal from (0, 0) to (n-1, m-1). For n == m this is the usual
+    |i - j| <= window. The diagonal is slanted for sequences of different
+    lengths so the end cell is always inside the band, and the window is
+    widened just enough to keep the band connected when m is much larger
+    than n. window=None allows every cell.
+
+    Returns (lo, hi, window actually used).
+    """
+    if window is None or n == 1:
+        return np.zeros(n, dtype=np.int64), np.full(n, m - 1, dtype=np.int64), None
+    centers = _centers(n, m)
+    window = max(int(window), int(np.diff(centers).max()) // 2)
+    return np.maximum(centers - window, 0), np.minimum(centers + window, m - 1), window
+
+
+def _centers(n, m):
+    if n == 1:
+        return np.zeros(1, dtype=np.int64)
+    return np.rint(np.arange(n) * ((m - 1) / (n - 1))).astype(np.int64)
+
+
+def _sweep(x, y, lo, hi, cutoff=np.inf, remaining=None, keep=False):
+    """
+    Accumulated DTW cost over the band, one anti-diagonal at a time
+
+    Every cell on anti-diagonal k = i + j depends only on diagonals k-1 and
+    k-2, so a whole diagonal is one vectorized step and only those two
+    previous diagonals are held. The local costs of every band cell are
+    computed up front in one pass and laid out diagonal by diagonal, which
+    keeps the loop to a few slice operations per diagonal; the total work
+    is the number of band cells, O(n * window). Buffers are indexed by
+    row + 1 and slot 0 stays inf for the row above the first.
+
+    Every path crosses diagonal k or k+1 (a match step skips one), so once
+    both have a minimum above cutoff the alignment is abandoned and inf is
+    returned. remaining[i], if given, is a lower bound on the cost still to
+    come after row i (see lb_keogh()) and is added to each cell before the
+    check, which abandons much earlier. keep=True also fills and returns the full
+    cost matrix for a backtrace.
+    """
+    n, m = len(x), len(y)
+    counts = hi - lo + 1
+    offsets = np.cumsum(counts) - counts
+    cell_rows = np.repeat(np.arange(n), counts)
+    cell_cols = np.arange(counts.sum()) - np.repeat(offsets - lo, counts)
+    diff = x[cell_rows] - y[cell_cols]
+    local = np.abs(diff[:, 0]) if x.shape[1] == 1 else np.sqrt(np.einsum('ij,ij->i', diff, diff))
+
+    # Cells sorted by diagonal; within one diagonal the rows are consecutive and ascending
+    order = np.argsort(cell_rows + cell_cols, kind='stable')
+    local, cell_rows = local[order], cell_rows[order]
+    ends = np.cumsum(np.bincount((cell_rows + cell_cols[order]), minlength=n + m - 1))
+    starts = (ends - np.diff(ends, prepend=0)).tolist()
+    first_rows = cell_rows[np.minimum(starts, len(cell_rows) - 1)].tolist()
+    ends = ends.tolist()
+
+    cost = np.full((n, m), np.inf) if keep else None
+    prev2, prev1, cur = np.full(n + 1, np.inf), np.full(n + 1, np.inf), np.full(n + 1, np.inf)
+    prev1[1] = local[0]
+    # Row range last written into each buffer, so it can be reset to inf on reuse
+    span2, span1, span0 = (0, 0), (1, 2), (0, 0)
+    if remaining is None:
+        remaining = np.zeros(n)
+    min1 = local[0] + remaining[0]
+
+    for k in range(1, n + m - 1):
+        i0 = first_rows[k]
+        i1 = i0 + ends[k] - starts[k]
+        cur[span0[0]:span0[1]] = np.inf
+        values = np.minimum(prev1[i0:i1], prev1[i0 + 1:i1 + 1])
+        np.minimum(values, prev2[i0:i1], out=values)
+        values += local[starts[k]:ends[k]]
+        cur[i0 + 1:i1 + 1] = values
+        if keep:
+            rows = np.arange(i0, i1)
+            cost[rows, k - rows] = values
+
+        if cutoff < np.inf:
+            # A diagonal can be empty where a match step jumps over it
+            min0 = (values + remaining[i0:i1]).min() if len(values) else np.inf
+            if min0 > cutoff and min1 > cutoff:
+                return np.inf, cost
+            min1 = min0
+        prev2, prev1, cur = prev1, cur, prev2
+        span2, span1, span0 = span1, (i0 + 1, i1 + 1), span2
+
+    if keep:
+        cost[0, 0] = local[0]
+    return float(prev1[n]), cost
+
+
+def dtw_distance(x, y, window=None, cutoff=np.inf, features_first=False):
+    """
+    DTW distance between two sequences
+
+    Local cost is the absolute difference for 1-D sequences and the
+    Euclidean distance between frames otherwise, with insertion, deletion
+    and match steps as in the Lab6 dtw_algorithm. Only two anti-diagonals
+    are held in memory. Returns inf if the alignment is abandoned because
+    it can't come in under cutoff.
+    """
+    x, y = as_frames(x, features_first), as_frames(y, features_first)
+    lo, hi, _ = band(len(x), len(y), window)
+    return _sweep(x, y, lo, hi, cutoff)[0]
+
+
+def dtw_path(x, y, window=None, features_first=False):
+    """
+    DTW distance, warping path and accumulated cost matrix
+
+    Same alignment as dtw_distance(), keeping the full cost matrix (inf
+    outside the band) so the path can be traced back the way
+    find_warping_path does in Lab6. The path is a list of (i, j) from
+    (0, 0) to (n-1, m-1).
+    """
+    x, y = as_frames(x, features_first), as_frames(y, features_first)
+    lo, hi, _ = band(len(x), len(y), window)
+    distance, cost = _sweep(x, y, lo, hi, keep=True)
+
+    i, j = len(x) - 1, len(y) - 1
+    path = [(i, j)]
+    while i > 0 or j > 0:
+        if i == 0:
+            j -= 1
+        elif j == 0:
+            i -= 1
+        else:
+            step = np.argmin((cost[i - 1, j - 1], cost[i - 1, j], cost[i, j - 1]))
+            if step == 0:
+                i, j = i - 1, j - 1
+            elif step == 1:
+                i -= 1
+            else:
+                j -= 1
+        path.append((i, j))
+    return distance, path[::-1], cost
+
+
+def envelope(y, window=None):
+    """
+    Upper and lower envelope of a (frames, features) sequence
+
+    upper[j] and lower[j] are the per-feature max and min of y within
+    `window` frames of j. Precomputed once per template for lb_keogh().
+    A stack of equal-length sequences (..., frames, features) is handled in
+    one pass.
+    """
+    if window is None:
+        return (np.broadcast_to(y.max(axis=-2, keepdims=True), y.shape).copy(),
+                np.broadcast_to(y.min(axis=-2, keepdims=True), y.shape).copy())
+    pad = [(0, 0)] * (y.ndim - 2) + [(window, window), (0, 0)]
+    padded_hi = np.pad(y, pad, constant_values=-np.inf)
+    padded_lo = np.pad(y, pad, constant_values=np.inf)
+    return (sliding_window_view(padded_hi, 2 * window + 1, axis=-2).max(axis=-1),
+            sliding_window_view(padded_lo, 2 * window + 1, axis=-2).min(axis=-1))
+
+
+def lb_kim(x, y):
+    """
+    LB_Kim lower bound on the DTW distance
+
+    Every path starts at (0, 0) and ends at (n-1, m-1), so the local cost
+    of those two cells can't be avoided. Constant time.
+    """
+    start = np.linalg.norm(x[0] - y[0])
+    if len(x) == 1 and len(y) == 1:
+        return float(start)
+    return float(start + np.linalg.norm(x[-1] - y[-1]))
+
+
+def lb_keogh(x, upper, lower, window=None):
+    """
+    LB_Keogh lower bound on the banded DTW distance
+
+    Each query frame x[i] is matched to at least one template frame inside
+    its band, and that frame lies within the template's envelope there, so
+    the distance from x[i] to the envelope box is a lower bound on its
+    cost. upper/lower come from envelope(template, window), and window must
+    be the one the DTW is run with. Linear time.
+    """
+    n, m = len(x), len(upper)
+    _, _, used = band(n, m, window)
+    if used != window:
+        # The band had to be widened, so the envelope no longer covers it
+        return 0.0
+    return float(_keogh_rows(x, upper, lower).sum())
+
+
+def _keogh_rows(x, upper, lower):
+    """Per-row LB_Keogh terms of x against (..., m, features) envelopes"""
+    centers = _centers(len(x), upper.shape[-2])
+    excess = np.maximum(x - upper[..., centers, :], 0) + np.maximum(lower[..., centers, :] - x, 0)
+    return np.sqrt(np.einsum('...ij,...ij->...i', excess, excess))
+
+
+class TemplateIndex:
+    """
+    Nearest-template search under banded DTW, for keyword and speaker matching
+
+    Templates are grouped by length with their envelopes precomputed, so
+    LB_Kim and LB_Keogh for one query against every template are a few
+    array operations per group. Candidates are then aligned in order of
+    their lower bound, each with early abandoning against the k-th best
+    distance so far (counting the LB_Keogh terms of the rows not yet
+    aligned), and the search stops as soon as the next bound can't beat it.
+
+    Distances are normalized by n + m (Lab7 divided by the path length,
+    which is only known after a backtrace) so templates of different
+    lengths compare fairly; similarity is 1 / (1 + distance) as in Lab7.
+    """
+
+    def __init__(self, window=None, features_first=False):
+        self.window = window
+        self.features_first = features_first
+        self.labels = []
+        self.templates = []
+        self.stats = {}
+        self._groups = None
+
+    def __len__(self):
+        return len(self.templates)
+
+    def add(self, label, features):
+        """Enroll one template (a label and its feature sequence)"""
+        self.labels.append(label)
+        self.templates.append(as_frames(features, self.features_first))
+        self._groups = None
+
+    def _build(self):
+        groups = {}
+        for idx, template in enumerate(self.templates):
+            groups.setdefault(template.shape, []).append(idx)
+        self._groups = []
+        for ids in groups.values():
+            stacked = np.stack([self.templates[idx] for idx in ids])
+            upper, lower = envelope(stacked, self.window)
+            self._groups.append({'ids': np.array(ids), 'first': stacked[:, 0], 'last': stacked[:, -1],
+                                 'upper': upper, 'lower': lower})
+
+    def lower_bounds(self, query):
+        """max(LB_Kim, LB_Keogh) of the query against every template, normalized like the distances"""
+        return self._bounds(as_frames(query, self.features_first))[0]
+
+    def _bounds(self, x):
+        """Normalized bounds per template, and the per-row LB_Keogh terms as a (templates, n) array"""
+        if self._groups is None:
+            self._build()
+        n = len(x)
+        bounds = np.zeros(len(self.templates))
+        rows = np.zeros((len(self.templates), n))
+        for group in self._groups:
+            m = group['upper'].shape[1]
+            kim = np.linalg.norm(group['first'] - x[0], axis=1)
+            if n > 1 or m > 1:
+                kim += np.linalg.norm(group['last'] - x[-1], axis=1)
+            keogh = 0.0
+            if band(n, m, self.window)[2] == self.window:
+                rows[group['ids']] = _keogh_rows(x, group['upper'], group['lower'])
+                keogh = rows[group['ids']].sum(axis=1)
+            bounds[group['ids']] = np.maximum(kim, keogh) / (n + m)
+        return bounds, rows
+
+    def search(self, query, k=1):
+        """
+        The k closest templates to a query
+
+        Returns a list of {'label', 'index', 'distance', 'similarity'}
+        dicts, best first. self.stats records how many templates were
+        pruned by the lower bounds, abandoned mid-alignment, or aligned in
+        full.
+        """
+        x = as_frames(query, self.features_first)
+        self.stats = {'templates': len(self.templates), 'pruned': 0, 'abandoned': 0, 'aligned': 0}
+        if not self.templates:
+            return []
+        bounds, rows = self._bounds(x)
+        # LB_Keogh terms of the rows after each row, for abandoning in _sweep()
+        remaining = np.cumsum(rows[:, ::-1], axis=1)[:, ::-1] - rows
+        order = np.argsort(bounds, kind='stable')
+
+        best = []  # max-heap of (-distance, -index)
+        for rank, idx in enumerate(order):
+            kth = -best[0][0] if len(best) == k else np.inf
+            if bounds[idx] >= kth:
+                self.stats['pruned'] += len(order) - rank
+                break
+            template = self.templates[idx]
+            scale = len(x) + len(template)
+            lo, hi, _ = band(len(x), len(template), self.window)
+            distance = _sweep(x, template, lo, hi, cutoff=kth * scale, remaining=remaining[idx])[0] / scale
+            if distance >= kth:
+                self.stats['abandoned' if np.isinf(distance) else 'aligned'] += 1
+                continue
+            self.stats['aligned'] += 1
+            entry = (-distance, -int(idx))
+            if len(best) < k:
+                heapq.heappush(best, entry)
+            else:
+                heapq.heapreplace(best, entry)
+
+        results = sorted((-d, -i) for d, i in best)
+        return [{'label': self.labels[idx], 'index': idx, 'distance': distance,
+                 'similarity': 1 / (1 + distance)} for distance, idx in results]
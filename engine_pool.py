@@ -0,0 +1,193 @@
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+import speech_recognition as sr
+
+
+SPHINX_DATA_DIR = os.path.join(os.path.dirname(os.path.realpath(sr.__file__)), "pocketsphinx-data")
+
+# Alternative Google Web Speech endpoint, e.g. the benchmark's local stand-in
+GOOGLE_ENDPOINT = os.environ.get('STT_GOOGLE_ENDPOINT')
+
+
+class WarmRecognizer(sr.Recognizer):
+    """
+    sr.Recognizer that keeps its PocketSphinx decoders loaded between calls
+
+    The stock recognize_sphinx builds a new decoder (acoustic model, language
+    model and dictionary) on every call. Here one decoder per language is
+    loaded once and reused, so repeated calls only pay decode cost.
+    """
+
+    def __init__(self, preload=('en-US',), google_endpoint=GOOGLE_ENDPOINT):
+        super().__init__()
+        self.google_endpoint = google_endpoint
+        self._decoders = {}
+        # Decoders are not thread-safe; an abandoned straggler may still be using one
+        self._decode_lock = threading.Lock()
+        self.created = time.time()
+        self.uses = 0
+        for language in preload:
+            self.warm(language)
+
+    def warm(self, language):
+        """Load the Sphinx decoder for a language ahead of use; False if there is no model for it"""
+        try:
+            self._decoder(language)
+            return True
+        except sr.RequestError:
+            return False
+
+    def _decoder(self, language):
+        if language not in self._decoders:
+            try:
+                from pocketsphinx import pocketsphinx
+            except ImportError:
+                raise sr.RequestError("missing PocketSphinx module: ensure that PocketSphinx is set up correctly.")
+
+            language_directory = os.path.join(SPHINX_DATA_DIR, language)
+            if not os.path.isdir(language_directory):
+                raise sr.RequestError(f"missing PocketSphinx language data directory: \"{language_directory}\"")
+
+            config = pocketsphinx.Config()
+            config.set_string("-hmm", os.path.join(language_directory, "acoustic-model"))
+            config.set_string("-lm", os.path.join(language_directory, "language-model.lm.bin"))
+            config.set_string("-dict", os.path.join(language_directory, "pronounciation-dictionary.dict"))
+            config.set_string("-logfn", os.devnull)
+            self._decoders[language] = pocketsphinx.Decoder(config)
+        return self._decoders[language]
+
+    def recognize_sphinx(self, audio_data, language='en-US', keyword_entries=None, grammar=None, show_all=False):
+        # Keyword search, grammars and custom model paths reconfigure the decoder, so use the stock path
+        if keyword_entries is not None or grammar is not None or not isinstance(language, str):
+            return super().recognize_sphinx(audio_data, language, keyword_entries, grammar, show_all)
+
+        raw_data = audio_data.get_raw_data(convert_rate=16000, convert_width=2)
+        with self._decode_lock:
+            decoder = self._decoder(language)
+            decoder.start_utt()
+            decoder.process_raw(raw_data, False, True)
+            decoder.end_utt()
+            if show_all:
+                return decoder
+            hypothesis = decoder.hyp()
+        if hypothesis is not None:
+            return hypothesis.hypstr
+        raise sr.UnknownValueError()
+
+    def recognize_google(self, audio_data, *args, **kwargs):
+        if self.google_endpoint:
+            kwargs.setdefault('endpoint', self.google_endpoint)
+        return super().recognize_google(audio_data, *args, **kwargs)
+
+    def check_health(self):
+        """Run a short silent utterance through every loaded decoder"""
+        silence = sr.AudioData(b'\x00\x00' * 1600, 16000, 2)
+        for language in list(self._decoders):
+            try:
+                self.recognize_sphinx(silence, language)
+            except sr.UnknownValueError:
+                pass
+        return True
+
+
+class EnginePool:
+    """
+    Fixed-size pool of warm recognizers shared by every request
+
+    Engines are built once and leased out one request at a time. Engines
+    that fail a health check (run at most every health_interval seconds per
+    engine) are replaced with fresh ones.
+
+    With lazy=True nothing is built up front: warm() builds the engines,
+    typically on a background thread, and a lease that finds no engine
+    ready while some are still unbuilt builds one itself rather than wait.
+    """
+
+    def __init__(self, size=2, factory=WarmRecognizer, health_interval=300, lazy=False):
+        self.size = size
+        self.factory = factory
+        self.health_interval = health_interval
+        self.replaced = 0
+        self._built = 0
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._last_check = {}
+        if not lazy:
+            while self._claim():
+                self._release(factory())
+
+    def _claim(self):
+        """Reserve one of the engines not built yet; False once all are built or being built"""
+        with self._lock:
+            if self._built >= self.size:
+                return False
+            self._built += 1
+            return True
+
+    def warm(self, languages=()):
+        """
+        Build any engines not built yet and load decoders for languages on each
+
+        Engines are taken one at a time, so requests keep being served while
+        warming. Returns the seconds spent.
+        """
+        start = time.perf_counter()
+        while self._claim():
+            engine = self.factory()
+            for language in languages:
+                engine.warm(language)
+            self._release(engine)
+        for _ in range(self.size):
+            with self.lease() as engine:
+                for language in languages:
+                    engine.warm(language)
+        return time.perf_counter() - start
+
+    def _release(self, engine):
+        self._last_check.setdefault(id(engine), time.time())
+        self._idle.put(engine)
+
+    def _replace(self, engine):
+        with self._lock:
+            self._last_check.pop(id(engine), None)
+            self.replaced += 1
+        return self.factory()
+
+    @contextmanager
+    def lease(self, timeout=30):
+        """Borrow an engine for the duration of a with block"""
+        try:
+            engine = self._idle.get_nowait()
+        except queue.Empty:
+            engine = self.factory() if self._claim() else None
+        if engine is None:
+            try:
+                engine = self._idle.get(timeout=timeout)
+            except queue.Empty:
+                raise TimeoutError(f"No recognition engine free after {timeout}s")
+
+        if time.time() - self._last_check.get(id(engine), 0) > self.health_interval:
+            try:
+                engine.check_health()
+                self._last_check[id(engine)] = time.time()
+            except Exception:
+                engine = self._replace(engine)
+
+        try:
+            yield engine
+        except (sr.UnknownValueError, sr.RequestError):
+            raise
+        except Exception:
+            # Unexpected failure: health-check the engine before it is leased again
+            self._last_check[id(engine)] = 0
+            raise
+        finally:
+            engine.uses += 1
+            self._release(engine)
+
+    def stats(self):
+        return {'size': self.size, 'built': self._built, 'idle': self._idle.qsize(), 'replaced': self.replaced}
@@ -0,0 +1,186 @@
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+
+class EventLog:
+    """
+    Fixed-capacity activity log of one session
+
+    Events are dicts with a timestamp, level, stage, message, optional
+    duration (seconds) and correlation ids (session, trace and job). The
+    newest capacity events are kept in memory for the UI; older ones fall
+    off the ring, and every event is also handed to sink (an EventSink) so
+    the full history survives on disk.
+    """
+
+    def __init__(self, capacity=100, sink=None, **ids):
+        self.events = deque(maxlen=capacity)
+        self.sink = sink
+        self.ids = ids
+        self.count = 0
+
+    def add(self, message, level='info', stage=None, duration=None, **ids):
+        """Record one event and return it"""
+        now = time.time()
+        self.count += 1
+        event = {
+            'ts': now,
+            'time': datetime.fromtimestamp(now).strftime("%H:%M:%S"),
+            'level': level,
+            'stage': stage,
+            'message': message,
+            'duration': duration,
+            'seq': self.count,
+            **self.ids,
+            **{key: value for key, value in ids.items() if value is not None},
+        }
+        self.events.append(event)
+        if self.sink is not None:
+            self.sink.emit(event)
+        return event
+
+    def clear(self):
+        """Empty the in-memory ring; events already sent to the sink stay on disk"""
+        self.events.clear()
+
+    def __iter__(self):
+        return iter(self.events)
+
+    def __len__(self):
+        return len(self.events)
+
+    def __bool__(self):
+        return bool(self.events)
+
+
+class EventSink:
+    """
+    Background writer appending events to a rotating JSONL file
+
+    emit() only puts the event on a bounded queue, so the caller never
+    waits for the disk; when the queue is full the event is counted in
+    dropped instead. A daemon thread takes whatever is queued (up to
+    batch_size events, waiting at most flush_interval for the first one)
+    and writes it with a single append. Once the file would pass
+    max_bytes it is renamed to path.1 (path.1 to path.2, and so on, keeping
+    backups old files) and a new one is started.
+    """
+
+    def __init__(self, path, max_bytes=10 * 1024 * 1024, backups=5, batch_size=256,
+                 flush_interval=1.0, max_pending=10000):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.dropped = 0
+        self.rotations = 0
+        self.errors = 0
+        self._queue = queue.Queue(max_pending)
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='event-sink', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def emit(self, event):
+        """Queue an event for writing without blocking"""
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self, timeout=5.0):
+        """Wait until everything emitted so far is on disk; False on timeout"""
+        if not self._thread.is_alive():
+            return False
+        marker = threading.Event()
+        try:
+            self._queue.put(marker, timeout=timeout)
+        except queue.Full:
+            return False
+        return marker.wait(timeout)
+
+    def close(self, timeout=5.0):
+        """Write out the pending events and stop the writer thread"""
+        if self._stopped.is_set():
+            return
+        self.flush(timeout)
+        self._stopped.set()
+        self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            batch, markers = [], []
+            item = first
+            while True:
+                (markers if isinstance(item, threading.Event) else batch).append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                self._write(batch)
+            for marker in markers:
+                marker.set()
+
+    def _write(self, batch):
+        data = ''.join(json.dumps(event, default=str) + '\n' for event in batch).encode('utf-8')
+        try:
+            if self.max_bytes and os.path.exists(self.path) \
+                    and os.path.getsize(self.path) + len(data) > self.max_bytes:
+                self._rotate()
+            with open(self.path, 'ab') as f:
+                f.write(data)
+            self.written += len(batch)
+        except OSError:
+            # A full or read-only disk must not take the app down; the events are counted as lost
+            self.errors += 1
+            self.dropped += len(batch)
+
+    def _rotate(self):
+        if self.backups <= 0:
+            os.remove(self.path)
+        else:
+            for i in range(self.backups - 1, 0, -1):
+                if os.path.exists(f"{self.path}.{i}"):
+                    os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        self.rotations += 1
+
+    def stats(self):
+        return {'written': self.written, 'pending': self._queue.qsize(), 'dropped': self.dropped,
+                'rotations': self.rotations, 'errors': self.errors}
+
+
+def read_events(path, backups=5, **match):
+    """
+    Events from a rotated JSONL log, oldest first
+
+    Keyword arguments filter on equal fields, e.g. job_id=... or
+    session_id=... to replay one request or one session.
+    """
+    files = [f"{path}.{i}" for i in range(backups, 0, -1)] + [path]
+    for name in files:
+        if not os.path.exists(name):
+            continue
+        with open(name, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue
+                if all(event.get(key) == value for key, value in match.items()):
+                    yield event
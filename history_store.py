@@ -0,0 +1,110 @@
+import sqlite3
+import threading
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcriptions (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    session_id TEXT,
+    source TEXT,
+    language TEXT,
+    text TEXT NOT NULL,
+    confidence REAL,
+    recognition_time REAL
+);
+CREATE INDEX IF NOT EXISTS idx_transcriptions_timestamp ON transcriptions (timestamp);
+CREATE INDEX IF NOT EXISTS idx_transcriptions_session ON transcriptions (session_id, id);
+CREATE INDEX IF NOT EXISTS idx_transcriptions_source ON transcriptions (source);
+CREATE INDEX IF NOT EXISTS idx_transcriptions_language ON transcriptions (language);
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS transcriptions_fts USING fts5 (
+    text, content='transcriptions', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS transcriptions_fts_insert AFTER INSERT ON transcriptions BEGIN
+    INSERT INTO transcriptions_fts (rowid, text) VALUES (new.id, new.text);
+END;
+"""
+
+COLUMNS = ('id', 'timestamp', 'session_id', 'source', 'language', 'text', 'confidence', 'recognition_time')
+
+
+class HistoryStore:
+    """
+    Append-only transcription history in SQLite
+
+    Rows are indexed on timestamp, session, source and language, and the
+    transcript text is full-text indexed (FTS5, falling back to LIKE when
+    SQLite was built without it). Pages are read on demand, so nothing but
+    the visible page is held in memory.
+    """
+
+    def __init__(self, path='transcription_history.db'):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+            try:
+                self._conn.executescript(FTS_SCHEMA)
+                self.full_text = True
+            except sqlite3.OperationalError:
+                self.full_text = False
+
+    def append(self, entry, session_id=None):
+        """Store one history entry (the dict shape used by the app) and return its id"""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO transcriptions (timestamp, session_id, source, language, text, confidence, recognition_time) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (entry['timestamp'], session_id, entry.get('source'), entry.get('language'),
+                 entry['text'], entry.get('confidence'), entry.get('recognition_time'))
+            )
+            return cursor.lastrowid
+
+    def _where(self, session_id=None, search=None, source=None, language=None):
+        clauses, params = [], []
+        if session_id is not None:
+            clauses.append("t.session_id = ?")
+            params.append(session_id)
+        if source is not None:
+            clauses.append("t.source = ?")
+            params.append(source)
+        if language is not None:
+            clauses.append("t.language = ?")
+            params.append(language)
+        if search:
+            if self.full_text:
+                # Quote every term so user input can't inject FTS syntax
+                query = ' '.join('"{}"'.format(term.replace('"', '""')) for term in search.split())
+                clauses.append("t.id IN (SELECT rowid FROM transcriptions_fts WHERE transcriptions_fts MATCH ?)")
+                params.append(query)
+            else:
+                for term in search.split():
+                    clauses.append("t.text LIKE ?")
+                    params.append(f"%{term}%")
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def count(self, **filters):
+        where, params = self._where(**filters)
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM transcriptions t{where}", params).fetchone()[0]
+
+    def page(self, offset=0, limit=10, **filters):
+        """Newest-first page of entries matching the filters"""
+        where, params = self._where(**filters)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join('t.' + c for c in COLUMNS)} FROM transcriptions t{where} "
+                "ORDER BY t.id DESC LIMIT ? OFFSET ?",
+                params + [limit, offset]
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
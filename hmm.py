@@ -0,0 +1,193 @@
+import numpy as np
+
+from viterbi import ViterbiDecoder
+
+
+class HMM:
+    """
+    Discrete HMM with parameters in NumPy arrays
+
+    States and observation symbols are interned to integer ids in the order
+    given; pi[i], A[i, j] (from i to j) and B[i, k] (symbol k in state i)
+    are float arrays indexed by those ids. from_dicts() builds one from the
+    dict-of-dicts layout of the Lab8 notebook, to_dicts() goes back.
+
+    Observation sequences may be given as symbol labels or ids. Batches of
+    sequences of different lengths are padded and evaluated together; see
+    forward_backward() and fit().
+    """
+
+    __slots__ = ('states', 'symbols', 'state_ids', 'symbol_ids', 'pi', 'A', 'B')
+
+    def __init__(self, states, symbols, pi, A, B):
+        self.states = tuple(states)
+        self.symbols = tuple(symbols)
+        self.state_ids = {state: i for i, state in enumerate(self.states)}
+        self.symbol_ids = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.pi = np.asarray(pi, dtype=np.float64)
+        self.A = np.asarray(A, dtype=np.float64)
+        self.B = np.asarray(B, dtype=np.float64)
+
+    @classmethod
+    def from_dicts(cls, states, symbols, pi, A, B):
+        """Build from Lab8-style dicts; missing entries are zero probability"""
+        model = cls(states, symbols, np.zeros(len(states)),
+                    np.zeros((len(states), len(states))), np.zeros((len(states), len(symbols))))
+        for state, p in pi.items():
+            model.pi[model.state_ids[state]] = p
+        for src, row in A.items():
+            for dst, p in row.items():
+                model.A[model.state_ids[src], model.state_ids[dst]] = p
+        for state, row in B.items():
+            for symbol, p in row.items():
+                model.B[model.state_ids[state], model.symbol_ids[symbol]] = p
+        return model
+
+    @classmethod
+    def random(cls, states, symbols, left_to_right=False, seed=None):
+        """Random starting parameters for training; left_to_right allows only self-loops and the next state"""
+        rng = np.random.default_rng(seed)
+        n, m = len(states), len(symbols)
+        if left_to_right:
+            pi = np.eye(n)[0]
+            A = np.eye(n) + np.eye(n, k=1)
+        else:
+            pi = np.ones(n)
+            A = np.ones((n, n))
+        A = A * rng.uniform(0.5, 1.5, (n, n))
+        B = rng.uniform(0.5, 1.5, (n, m))
+        return cls(states, symbols, pi / pi.sum(), A / A.sum(axis=1, keepdims=True),
+                   B / B.sum(axis=1, keepdims=True))
+
+    def to_dicts(self):
+        """(pi, A, B) as Lab8-style dicts, leaving out zero entries"""
+        pi = {state: float(p) for state, p in zip(self.states, self.pi)}
+        A = {src: {dst: float(p) for dst, p in zip(self.states, row) if p}
+             for src, row in zip(self.states, self.A)}
+        B = {state: {symbol: float(p) for symbol, p in zip(self.symbols, row) if p}
+             for state, row in zip(self.states, self.B)}
+        return pi, A, B
+
+    def encode(self, sequence):
+        """Symbol ids of one observation sequence given as labels (ids pass through)"""
+        if len(sequence) and isinstance(sequence[0], (int, np.integer)):
+            return np.asarray(sequence, dtype=np.int64)
+        ids = self.symbol_ids
+        return np.fromiter((ids[symbol] for symbol in sequence), dtype=np.int64, count=len(sequence))
+
+    def _pad(self, sequences):
+        """(time, batch) symbol ids padded with 0, and the sequence lengths"""
+        encoded = [self.encode(seq) for seq in sequences]
+        lengths = np.array([len(seq) for seq in encoded], dtype=np.int64)
+        symbols = np.zeros((lengths.max(initial=0), len(encoded)), dtype=np.int64)
+        for b, seq in enumerate(encoded):
+            symbols[:len(seq), b] = seq
+        return symbols, lengths
+
+    def sample(self, n_steps, seed=None):
+        """Generate (state labels, symbol labels) like generate_hmm_sequence in Lab8"""
+        rng = np.random.default_rng(seed)
+        cum_A, cum_B = np.cumsum(self.A, axis=1), np.cumsum(self.B, axis=1)
+        draws = rng.random((n_steps, 2))
+        state = int(np.searchsorted(np.cumsum(self.pi), rng.random(), side='right'))
+        states, symbols = [], []
+        for t in range(n_steps):
+            states.append(self.states[state])
+            symbols.append(self.symbols[min(int(np.searchsorted(cum_B[state], draws[t, 0], side='right')),
+                                            len(self.symbols) - 1)])
+            if cum_A[state, -1] > 0:
+                state = min(int(np.searchsorted(cum_A[state], draws[t, 1], side='right')), len(self.states) - 1)
+        return states, symbols
+
+    def forward_backward(self, sequences):
+        """
+        Scaled forward and backward passes over a batch of sequences
+
+        Each step is one (batch, states) @ (states, states) product for
+        every sequence at once. alpha is renormalized to sum to 1 at every
+        step and the scale factors are kept, so nothing underflows and the
+        log-likelihood is the sum of their logs. Steps past a sequence's
+        end get scale 1 and leave alpha/beta alone.
+
+        Returns: alpha and beta (time, batch, states), scales (time, batch),
+        the padded symbols (time, batch) and the lengths.
+        """
+        symbols, lengths = self._pad(sequences)
+        steps, batch = symbols.shape
+        n = len(self.states)
+        valid = np.arange(steps)[:, None] < lengths
+        emissions = self.B.T[symbols]  # (time, batch, states)
+
+        alpha = np.empty((steps, batch, n))
+        scales = np.ones((steps, batch))
+        a = self.pi * emissions[0] if steps else None
+        for t in range(steps):
+            if t:
+                a = np.where(valid[t, :, None], (alpha[t - 1] @ self.A) * emissions[t], alpha[t - 1])
+            c = a.sum(axis=1)
+            c = np.where(valid[t], np.maximum(c, 1e-300), 1.0)
+            alpha[t] = a / c[:, None]
+            scales[t] = c
+
+        beta = np.ones((steps, batch, n))
+        for t in range(steps - 2, -1, -1):
+            inside = valid[t + 1, :, None]
+            b = ((emissions[t + 1] * beta[t + 1]) @ self.A.T) / scales[t + 1, :, None]
+            beta[t] = np.where(inside, b, 1.0)
+        return alpha, beta, scales, symbols, lengths
+
+    def log_likelihood(self, sequences):
+        """log P(sequence | model) for each sequence"""
+        return np.log(self.forward_backward(sequences)[2]).sum(axis=0)
+
+    def fit(self, sequences, n_iter=20, tol=1e-4, batch_size=1024):
+        """
+        Baum-Welch re-estimation over many sequences
+
+        Every iteration runs forward_backward() over the sequences in
+        batches of batch_size and accumulates the expected counts with a
+        few tensor contractions per batch: the expected transitions are
+        alpha[t] x (emission[t+1] * beta[t+1] / scale[t+1]) summed over all
+        t and sequences in one einsum, times A. Zero probabilities stay
+        zero, so a left-to-right topology is kept. Stops when the total
+        log-likelihood improves by less than tol per sequence.
+
+        Returns the total log-likelihood before each update.
+        """
+        history = []
+        n, m = len(self.states), len(self.symbols)
+        for _ in range(n_iter):
+            pi_num = np.zeros(n)
+            trans = np.zeros((n, n))
+            emit = np.zeros((m, n))
+            total = 0.0
+            for start in range(0, len(sequences), batch_size):
+                alpha, beta, scales, symbols, lengths = self.forward_backward(sequences[start:start + batch_size])
+                total += np.log(scales).sum()
+                valid = np.arange(len(symbols))[:, None] < lengths
+                gamma = alpha * beta * valid[..., None]
+                pi_num += gamma[0].sum(axis=0)
+
+                if len(symbols) > 1:
+                    emissions = self.B.T[symbols[1:]]
+                    ahead = emissions * beta[1:] / scales[1:, :, None] * valid[1:, :, None]
+                    trans += np.einsum('tbi,tbj->ij', alpha[:-1], ahead)
+                np.add.at(emit, symbols[valid], gamma[valid])
+
+            history.append(total)
+            self.pi = pi_num / max(pi_num.sum(), 1e-300)
+            self.A = _normalize_rows(trans * self.A, self.A)
+            self.B = _normalize_rows(emit.T, self.B)
+            if len(history) > 1 and history[-1] - history[-2] < tol * len(sequences):
+                break
+        return history
+
+    def decode(self, sequences, beam=None):
+        """Most likely state-id path and its log probability per sequence (see viterbi.ViterbiDecoder)"""
+        return ViterbiDecoder(self.pi, self.A, self.B, beam).decode([self.encode(seq) for seq in sequences])
+
+
+def _normalize_rows(counts, previous):
+    """Rows of counts scaled to sum to 1; rows with no counts keep their previous values"""
+    sums = counts.sum(axis=1, keepdims=True)
+    return np.where(sums > 0, counts / np.where(sums > 0, sums, 1.0), previous)
@@ -0,0 +1,267 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+
+class QueueFullError(Exception):
+    """Raised by submit() when the scheduler, or the session's share of it, is full"""
+
+
+class TokenBucket:
+    """
+    Token-bucket rate limiter
+
+    Holds up to `burst` tokens and refills at `rate` tokens per second;
+    every request spends one token. rate must be positive.
+    """
+
+    def __init__(self, rate, burst=1):
+        if rate <= 0:
+            raise ValueError(f"TokenBucket rate must be positive, got {rate}")
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        """Spend a token if one is available; returns 0.0, or the seconds until the next token"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    def acquire(self):
+        """Block until a token is available and spend it"""
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return
+            time.sleep(wait)
+
+    def available(self):
+        with self._lock:
+            return min(self.burst, self.tokens + (time.monotonic() - self.updated) * self.rate)
+
+
+class Job:
+    """
+    One unit of work on the scheduler
+
+    fn(job) runs on a worker thread and may call job.report() to publish
+    progress and partial output; every field is safe to poll from other
+    threads.
+    """
+
+    def __init__(self, session_id, fn, backend=None, label=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.session_id = session_id
+        self.fn = fn
+        self.backend = backend
+        self.label = label
+        self.state = 'queued'
+        self.progress = 0.0
+        self.partial = None
+        self.result = None
+        self.error = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self._done = threading.Event()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def report(self, progress=None, partial=None):
+        """Publish progress (0..1) and/or partial output from inside fn"""
+        if progress is not None:
+            self.progress = progress
+        if partial is not None:
+            self.partial = partial
+
+    def wait(self, timeout=None):
+        """Block until the job finishes; returns its result or raises its error"""
+        if not self._done.wait(timeout):
+            raise TimeoutError(f"Job {self.id} still {self.state} after {timeout}s")
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+    def _finish(self, state, result=None, error=None):
+        self.result = result
+        self.error = error
+        self.finished = time.time()
+        if state == 'done':
+            self.progress = 1.0
+        self.state = state
+        self._done.set()
+
+
+class JobScheduler:
+    """
+    Bounded worker pool shared by every session
+
+    Jobs wait in one FIFO per session and workers take them round-robin
+    across sessions, so a session with many jobs can't starve the others.
+    Each backend may have a token-bucket rate limit, (rate, burst) in
+    rate_limits (a rate of 0 or less means no limit); a job is only started
+    when its backend has a token, and jobs for other backends skip past it
+    in the meantime. submit() raises
+    QueueFullError once max_queue jobs (or max_per_session for one session)
+    are waiting, instead of letting the queue grow without bound.
+
+    Finished jobs are kept for `retention` seconds so their results can be
+    collected by polling.
+    """
+
+    def __init__(self, workers=4, max_queue=32, max_per_session=4, rate_limits=None, retention=600):
+        self.max_queue = max_queue
+        self.max_per_session = max_per_session
+        self.retention = retention
+        self.buckets = {name: TokenBucket(rate, burst) for name, (rate, burst) in (rate_limits or {}).items()
+                        if rate > 0}
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.errors = 0
+        self._queues = OrderedDict()
+        self._jobs = {}
+        self._cond = threading.Condition()
+        self._workers = [threading.Thread(target=self._work, name=f'job-worker-{i}', daemon=True)
+                         for i in range(workers)]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, session_id, fn, backend=None, label=None):
+        """Queue fn(job) for a session and return the job id"""
+        with self._cond:
+            self._prune()
+            session_queue = self._queues.get(session_id)
+            if self.queued >= self.max_queue:
+                self.rejected += 1
+                raise QueueFullError(f"{self.queued} jobs already waiting")
+            if session_queue and len(session_queue) >= self.max_per_session:
+                self.rejected += 1
+                raise QueueFullError(f"{len(session_queue)} of this session's jobs already waiting")
+            job = Job(session_id, fn, backend, label)
+            self._jobs[job.id] = job
+            self._queues.setdefault(session_id, deque()).append(job)
+            self.queued += 1
+            self._cond.notify()
+        return job.id
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def wait(self, job_id, timeout=None):
+        """Block until a job finishes; returns its result or raises its error"""
+        return self._jobs[job_id].wait(timeout)
+
+    def cancel(self, job_id):
+        """Drop a job that hasn't started yet; returns False if it is already running or done"""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            session_queue = self._queues.get(job.session_id) if job else None
+            if not session_queue or job not in session_queue:
+                return False
+            session_queue.remove(job)
+            if not session_queue:
+                del self._queues[job.session_id]
+            self.queued -= 1
+        job._finish('cancelled')
+        return True
+
+    def throttle(self, backend):
+        """Wait for the backend's rate limit inside a running job that makes several requests"""
+        bucket = self.buckets.get(backend)
+        if bucket:
+            bucket.acquire()
+
+    def position(self, job_id):
+        """Number of queued jobs that will be offered to a worker before this one"""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            session_queue = self._queues.get(job.session_id) if job else None
+            if not session_queue or job not in session_queue:
+                return 0
+            # Round-robin: every other session gets up to as many turns as this one needs
+            turns = session_queue.index(job) + 1
+            return turns - 1 + sum(min(len(q), turns) for sid, q in self._queues.items() if sid != job.session_id)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'queued': self.queued, 'running': self.running, 'workers': len(self._workers),
+                'sessions': len(self._queues), 'completed': self.completed, 'rejected': self.rejected,
+                'errors': self.errors,
+                'tokens': {name: round(bucket.available(), 2) for name, bucket in self.buckets.items()},
+            }
+
+    def _next_job(self):
+        """Pop the next runnable job round-robin over sessions; else (None, seconds until a token)"""
+        wait = None
+        for session_id, session_queue in list(self._queues.items()):
+            job = session_queue[0]
+            bucket = self.buckets.get(job.backend)
+            try:
+                delay = bucket.try_acquire() if bucket else 0.0
+            except Exception as e:
+                # A broken rate limit fails this job instead of the worker thread
+                self._pop(session_id, session_queue)
+                job._finish('failed', error=e)
+                continue
+            if delay:
+                wait = delay if wait is None else min(wait, delay)
+                continue
+            self._pop(session_id, session_queue)
+            return job, None
+        return None, wait
+
+    def _pop(self, session_id, session_queue):
+        session_queue.popleft()
+        # This session moves to the back of the rotation
+        del self._queues[session_id]
+        if session_queue:
+            self._queues[session_id] = session_queue
+        self.queued -= 1
+
+    def _take(self):
+        """Block until a job can start; called with _cond held"""
+        while True:
+            try:
+                job, wait = self._next_job()
+            except Exception:
+                # A scheduling error must never end the worker and strand the queue
+                self.errors += 1
+                job, wait = None, 1.0
+            if job is not None:
+                return job
+            self._cond.wait(wait)
+
+    def _prune(self):
+        cutoff = time.time() - self.retention
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished and job.finished < cutoff]:
+            del self._jobs[job_id]
+
+    def _work(self):
+        while True:
+            with self._cond:
+                job = self._take()
+                self.running += 1
+            job.started = time.time()
+            job.state = 'running'
+            try:
+                job._finish('done', result=job.fn(job))
+            except Exception as e:
+                job._finish('failed', error=e)
+            finally:
+                with self._cond:
+                    self.running -= 1
+                    self.completed += 1
@@ -0,0 +1,161 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from audio_processing import TARGET_RATE, stream_audio
+
+
+def frame_autocorrelation(frames, order):
+    """
+    Autocorrelation lags 0..order of every frame in one FFT pass
+
+    frames is a (frames, frame_len) array. Each frame is zero-padded to at
+    least 2 * frame_len - 1 so the circular correlation equals the linear
+    one (what the Lab4 autocorrelate() computes one lag at a time).
+    """
+    n_fft = 1 << (2 * frames.shape[-1] - 1).bit_length()
+    spectrum = np.fft.rfft(frames, n_fft, axis=-1)
+    power = spectrum.real ** 2 + spectrum.imag ** 2
+    return np.fft.irfft(power, n_fft, axis=-1)[..., :order + 1]
+
+
+def levinson_durbin(r, order=None):
+    """
+    Levinson-Durbin recursion for many autocorrelation sequences at once
+
+    r has shape (..., order + 1); the recursion loops over the order and
+    every step updates all frames together. Silent frames (zero energy)
+    get the trivial predictor [1, 0, ..., 0].
+
+    Returns: (a with shape (..., order + 1) and a[..., 0] == 1, prediction error per frame)
+    """
+    r = np.asarray(r, dtype=np.float64)
+    order = r.shape[-1] - 1 if order is None else order
+    a = np.zeros(r.shape[:-1] + (order + 1,))
+    a[..., 0] = 1.0
+    e = r[..., 0].copy()
+
+    for i in range(1, order + 1):
+        acc = np.einsum('...j,...j->...', a[..., :i], r[..., i:0:-1])
+        live = e > 0
+        k = np.where(live, -acc / np.where(live, e, 1.0), 0.0)
+        # a[j] += k * a[i - j] for j = 1..i, from the previous coefficients
+        a[..., 1:i + 1] = a[..., 1:i + 1] + k[..., None] * a[..., i - 1::-1]
+        e = e * (1 - k ** 2)
+    return a, e
+
+
+def formants_from_lpc(a, sample_rate, n_formants=4, min_freq=90.0, max_bandwidth=400.0):
+    """
+    Formant frequencies and bandwidths from the roots of many LPC polynomials
+
+    The roots of each A(z) are the eigenvalues of its companion matrix, so
+    all frames are solved with one batched eigvals call. Each complex pole
+    pair with a frequency above min_freq and a bandwidth below
+    max_bandwidth is a formant candidate; the lowest n_formants are kept.
+    Lab4 picked peaks off the LPC spectrum instead, which merges close
+    formants.
+
+    Returns: (frequencies, bandwidths), each (frames, n_formants) in Hz, NaN where fewer were found
+    """
+    a = np.atleast_2d(a)
+    n_frames, p = len(a), a.shape[1] - 1
+    companion = np.zeros((n_frames, p, p))
+    companion[:, 0, :] = -a[:, 1:] / a[:, :1]
+    companion[:, np.arange(1, p), np.arange(p - 1)] = 1.0
+    roots = np.linalg.eigvals(companion)
+
+    freqs = np.angle(roots) * sample_rate / (2 * np.pi)
+    bandwidths = -np.log(np.maximum(np.abs(roots), 1e-12)) * sample_rate / np.pi
+    valid = (roots.imag > 0) & (freqs > min_freq) & (bandwidths < max_bandwidth)
+    freqs = np.where(valid, freqs, np.inf)
+
+    order = np.argsort(freqs, axis=1)[:, :n_formants]
+    freqs = np.take_along_axis(freqs, order, axis=1)
+    bandwidths = np.take_along_axis(bandwidths, order, axis=1)
+    missing = np.isinf(freqs)
+    freqs[missing] = np.nan
+    bandwidths[missing] = np.nan
+    if freqs.shape[1] < n_formants:
+        pad = ((0, 0), (0, n_formants - freqs.shape[1]))
+        freqs = np.pad(freqs, pad, constant_values=np.nan)
+        bandwidths = np.pad(bandwidths, pad, constant_values=np.nan)
+    return freqs, bandwidths
+
+
+class FormantTracker:
+    """
+    Frame-wise LPC analysis over a stream of sample blocks
+
+    Each process() call frames whatever samples are available (Hamming
+    window, frame_ms long every hop_ms), runs the batched autocorrelation,
+    Levinson-Durbin and root finding over all of them, and keeps the
+    unfinished tail for the next block. Memory depends on the block size,
+    not the recording length.
+    """
+
+    def __init__(self, sample_rate, order=12, frame_ms=25, hop_ms=10, n_formants=4, preemphasis=0.97):
+        self.sample_rate = sample_rate
+        self.order = order
+        self.frame_len = int(sample_rate * frame_ms / 1000)
+        self.hop = int(sample_rate * hop_ms / 1000)
+        self.n_formants = n_formants
+        self.preemphasis = preemphasis
+        self.window = np.hamming(self.frame_len)
+        self._pending = np.zeros(0)
+        self._last = 0.0
+        self._frames_done = 0
+
+    def process(self, samples):
+        """
+        Analyze the next block of samples
+
+        Returns a dict of per-frame arrays for every frame completed by this
+        block: 'time' (frame centre, seconds), 'formants' and 'bandwidths'
+        (frames, n_formants) in Hz, 'error' (prediction error) and
+        'energy_db'.
+        """
+        x = np.asarray(samples, dtype=np.float64)
+        if len(x):
+            emphasized = np.empty_like(x)
+            emphasized[0] = x[0] - self.preemphasis * self._last
+            emphasized[1:] = x[1:] - self.preemphasis * x[:-1]
+            self._last = x[-1]
+            x = np.concatenate([self._pending, emphasized])
+        else:
+            x = self._pending
+
+        n_frames = max(0, (len(x) - self.frame_len) // self.hop + 1)
+        self._pending = x[n_frames * self.hop:].copy()
+        if n_frames:
+            frames = sliding_window_view(x, self.frame_len)[::self.hop][:n_frames] * self.window
+        else:
+            frames = np.zeros((0, self.frame_len))
+
+        r = frame_autocorrelation(frames, self.order)
+        a, error = levinson_durbin(r, self.order)
+        formants, bandwidths = formants_from_lpc(a, self.sample_rate, self.n_formants)
+
+        index = self._frames_done + np.arange(n_frames)
+        self._frames_done += n_frames
+        return {
+            'time': (index * self.hop + self.frame_len / 2) / self.sample_rate,
+            'formants': formants,
+            'bandwidths': bandwidths,
+            'error': error,
+            'energy_db': 10 * np.log10(r[:, 0] / self.frame_len + 1e-12),
+        }
+
+
+def formant_track(data, order=12, frame_ms=25, hop_ms=10, n_formants=4, sample_rate=TARGET_RATE):
+    """
+    Formant track of an audio file of any length, one block at a time
+
+    data is anything load_audio() accepts; it is decoded and resampled to
+    sample_rate block by block (see stream_audio()) and each block's frames
+    are yielded as a FormantTracker.process() dict.
+    """
+    tracker = FormantTracker(sample_rate, order, frame_ms, hop_ms, n_formants)
+    for block in stream_audio(data, sample_rate):
+        result = tracker.process(block)
+        if len(result['time']):
+            yield result
@@ -0,0 +1,163 @@
+import queue
+import threading
+import time
+from collections import deque
+
+import speech_recognition as sr
+
+
+class CalibrationCache:
+    """
+    Ambient-noise energy thresholds per input device with a freshness window
+
+    A fresh threshold lets a recording start listening immediately instead
+    of spending a second in adjust_for_ambient_noise. Thresholds are also
+    refreshed from the recognizer after every listen(), since its dynamic
+    energy adjustment already adapts to the quiet frames before speech.
+    """
+
+    def __init__(self, max_age=300):
+        self.max_age = max_age
+        self._thresholds = {}
+        self._lock = threading.Lock()
+
+    def get(self, device_index=None):
+        """Return the cached threshold for a device, or None if missing or stale"""
+        with self._lock:
+            entry = self._thresholds.get(device_index)
+        if entry and time.time() - entry[1] <= self.max_age:
+            return entry[0]
+        return None
+
+    def update(self, device_index, threshold):
+        with self._lock:
+            self._thresholds[device_index] = (threshold, time.time())
+
+    def prepare(self, recognizer, source, device_index=None, duration=1):
+        """
+        Apply a cached threshold to recognizer, calibrating only when needed
+
+        Returns the seconds spent calibrating (0.0 when the cache was used).
+        """
+        threshold = self.get(device_index)
+        if threshold is not None:
+            recognizer.energy_threshold = threshold
+            return 0.0
+        start = time.time()
+        recognizer.adjust_for_ambient_noise(source, duration=duration)
+        self.update(device_index, recognizer.energy_threshold)
+        return time.time() - start
+
+
+class ContinuousListener:
+    """
+    Background microphone transcription as a producer/consumer pipeline
+
+    A capture thread cuts the microphone stream into phrases and pushes the
+    AudioData onto a bounded queue; a recognition thread drains the queue
+    through recognize(audio) -> text. When recognition falls behind and the
+    queue is full, capture waits for room (backpressure) instead of
+    discarding phrases, and every wait is counted in stats().
+
+    Results are collected in a thread-safe deque; the Streamlit script
+    thread calls drain() to pick them up, since worker threads cannot touch
+    st.session_state. A monitor (audio_monitor.AudioMonitor), if given, is
+    attached to the microphone so the captured audio can be shown live.
+    """
+
+    def __init__(self, recognize, max_queue=8, phrase_time_limit=10, device_index=None, calibration=None,
+                 monitor=None):
+        self.recognize = recognize
+        self.monitor = monitor
+        self.calibration = calibration or CalibrationCache()
+        self.phrase_time_limit = phrase_time_limit
+        self.device_index = device_index
+        self.audio_queue = queue.Queue(maxsize=max_queue)
+        self.results = deque()
+        self.phrases = 0
+        self.backpressure_waits = 0
+        self.error = None
+        self._stop = threading.Event()
+        self._threads = []
+
+    @property
+    def running(self):
+        return any(thread.is_alive() for thread in self._threads)
+
+    def start(self):
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._capture, name='mic-capture', daemon=True),
+            threading.Thread(target=self._consume, name='mic-recognize', daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        """
+        Signal capture to stop and return at once
+
+        Phrases already queued are still recognized; running turns False
+        once the last result is in results.
+        """
+        self._stop.set()
+
+    def drain(self):
+        """Return and clear every result produced since the last call"""
+        items = []
+        while self.results:
+            items.append(self.results.popleft())
+        return items
+
+    def stats(self):
+        return {'phrases': self.phrases, 'queued': self.audio_queue.qsize(),
+                'backpressure_waits': self.backpressure_waits}
+
+    def _capture(self):
+        recognizer = sr.Recognizer()
+        try:
+            with sr.Microphone(device_index=self.device_index) as source:
+                if self.monitor is not None:
+                    self.monitor.attach(source)
+                self.calibration.prepare(recognizer, source, self.device_index)
+                while not self._stop.is_set():
+                    try:
+                        audio = recognizer.listen(source, timeout=1, phrase_time_limit=self.phrase_time_limit)
+                    except sr.WaitTimeoutError:
+                        continue
+                    finally:
+                        self.calibration.update(self.device_index, recognizer.energy_threshold)
+                    self._enqueue(audio)
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            # Sentinel: tells the consumer nothing more is coming
+            self._enqueue(None, force=True)
+
+    def _enqueue(self, audio, force=False):
+        while True:
+            try:
+                self.audio_queue.put(audio, timeout=0.5)
+                return
+            except queue.Full:
+                self.backpressure_waits += 1
+                if self._stop.is_set() and not force:
+                    return
+
+    def _consume(self):
+        while True:
+            audio = self.audio_queue.get()
+            if audio is None:
+                return
+            self.phrases += 1
+            duration = len(audio.frame_data) / (audio.sample_rate * audio.sample_width)
+            start = time.time()
+            entry = {'timestamp': time.time(), 'duration': duration, 'text': None, 'error': None}
+            try:
+                entry['text'] = self.recognize(audio)
+            except sr.UnknownValueError:
+                pass
+            except Exception as e:
+                entry['error'] = str(e)
+            entry['recognition_time'] = time.time() - start
+            self.results.append(entry)
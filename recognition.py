@@ -0,0 +1,402 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import speech_recognition as sr
+
+from audio_processing import audio_data_to_array, split_on_silence
+
+
+def slice_audio(audio, start, end):
+    """Return samples [start, end) of an AudioData as a new AudioData"""
+    width = audio.sample_width
+    return sr.AudioData(audio.frame_data[start * width:end * width], audio.sample_rate, width)
+
+
+def segment_audio(audio, max_segment_s=15.0, min_silence_ms=300):
+    """Split an AudioData on silence into timestamped segments"""
+    samples = audio_data_to_array(audio)
+    bounds = split_on_silence(samples, audio.sample_rate,
+                              min_silence_ms=min_silence_ms, max_segment_s=max_segment_s)
+    return [{
+        'start': start / audio.sample_rate,
+        'end': end / audio.sample_rate,
+        'audio': slice_audio(audio, start, end)
+    } for start, end in bounds]
+
+
+def parse_google_result(result):
+    """Pull (transcript, confidence, alternatives) out of a show_all response"""
+    if isinstance(result, dict) and result.get('alternative'):
+        alternatives = result['alternative']
+        best = alternatives[0]
+        return best.get('transcript', ''), best.get('confidence', 0), alternatives[1:4]
+    return '', 0, []
+
+
+def recognize_best(recognizer, audio, language='en-US', engine='google'):
+    """
+    Recognize a whole AudioData with one engine
+
+    This is the transcription core shared by the app and batch mode.
+    Returns (transcript, confidence, alternatives); confidence is None for
+    engines that don't report one. Raises sr.UnknownValueError when nothing
+    was recognized and sr.RequestError when the engine is unavailable.
+    """
+    if engine == 'google':
+        transcript, confidence, alternatives = parse_google_result(
+            recognizer.recognize_google(audio, language=language, show_all=True)
+        )
+        if not transcript:
+            raise sr.UnknownValueError()
+        return transcript, confidence, alternatives
+    if engine == 'sphinx':
+        transcript = recognizer.recognize_sphinx(audio, language=language)
+        if not transcript:
+            raise sr.UnknownValueError()
+        return transcript, None, []
+    raise ValueError(f"Unknown engine: {engine}")
+
+
+def leading_speech(audio, seconds=4.0, min_silence_ms=300):
+    """The first `seconds` of audio from where speech starts (leading silence skipped)"""
+    rate = audio.sample_rate
+    total = len(audio.frame_data) // audio.sample_width
+    # Only the opening stretch is searched for the first segment
+    head = slice_audio(audio, 0, min(total, int((seconds + 5) * rate)))
+    bounds = split_on_silence(audio_data_to_array(head), rate, min_silence_ms=min_silence_ms)
+    start = bounds[0][0] if bounds else 0
+    return slice_audio(audio, start, min(total, start + int(seconds * rate)))
+
+
+def identify_language(recognizer, audio, candidates, probe_seconds=4.0, confident=0.85, deadline=15.0,
+                      max_parallel=4, throttle=None):
+    """
+    Pick the language of audio among candidate language codes
+
+    The first probe_seconds of speech (see leading_speech()) are sent to
+    Google once per candidate, up to max_parallel requests at a time, and
+    the candidate with the highest confidence wins (ties go to the earlier
+    candidate). An answer with at least `confident` ends the race at once:
+    candidates still queued never start and running ones are abandoned, as
+    are those still running at the deadline. throttle(), if given, is
+    called before every request (e.g. to share a rate limit).
+
+    Returns a dict with language, confidence, text (of the probe), scores
+    (candidate -> confidence, None when it recognized nothing), cancelled
+    (candidates that never answered) and time. Raises sr.UnknownValueError
+    when no candidate recognized anything, or sr.RequestError when they all
+    failed or none answered in time.
+    """
+    start = time.time()
+    probe = leading_speech(audio, probe_seconds)
+    stop = threading.Event()
+
+    def attempt(language):
+        if throttle is not None:
+            throttle()
+        if stop.is_set():
+            return None
+        return recognize_best(recognizer, probe, language, 'google')
+
+    scores, texts, errors = {}, {}, []
+    pool = ThreadPoolExecutor(max_workers=min(max_parallel, len(candidates)), thread_name_prefix='language')
+    try:
+        futures = {pool.submit(attempt, language): language for language in candidates}
+        pending = set(futures)
+        while pending and not stop.is_set():
+            done, pending = wait(pending, timeout=max(0, start + deadline - time.time()),
+                                 return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                language = futures[future]
+                scores[language] = None
+                try:
+                    text, confidence, _ = future.result()
+                except sr.UnknownValueError:
+                    continue
+                except sr.RequestError as e:
+                    errors.append(e)
+                    continue
+                scores[language] = confidence or 0.0
+                texts[language] = text
+                if scores[language] >= confident:
+                    stop.set()
+    finally:
+        stop.set()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    if not texts:
+        if not scores:
+            raise sr.RequestError(f"no candidate language answered within {deadline:g}s")
+        if len(errors) == len(scores):
+            raise errors[0]
+        raise sr.UnknownValueError()
+    best = max(texts, key=lambda language: (scores[language], -candidates.index(language)))
+    return {'language': best, 'confidence': scores[best], 'text': texts[best], 'scores': scores,
+            'cancelled': [language for language in candidates if language not in scores],
+            'time': time.time() - start}
+
+
+def transcribe_segments(segments, recognize, max_workers=4):
+    """
+    Recognize segments on a bounded thread pool
+
+    recognize(audio) must return (transcript, confidence, alternatives).
+    Results are yielded in segment order as soon as each one (and every
+    segment before it) is done, so the first text is available after one
+    segment instead of after the whole file.
+    """
+    segments = iter(segments)
+    window = 2 * max_workers
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending = deque()
+
+        def submit_next():
+            segment = next(segments, None)
+            if segment is not None:
+                pending.append((segment, pool.submit(recognize, segment['audio'])))
+
+        for _ in range(window):
+            submit_next()
+
+        index = 0
+        while pending:
+            segment, future = pending.popleft()
+            submit_next()
+
+            entry = {'index': index, 'start': segment['start'], 'end': segment['end'],
+                     'text': '', 'confidence': 0, 'alternatives': [], 'error': None}
+            try:
+                entry['text'], entry['confidence'], entry['alternatives'] = future.result()
+            except sr.UnknownValueError:
+                pass
+            except sr.RequestError as e:
+                entry['error'] = str(e)
+            yield entry
+            index += 1
+
+
+# Registered recognition backends:
+# name -> {'recognize': fn(recognizer, audio, language), 'deadline': seconds, 'engine': name for can_serve()}
+BACKENDS = {}
+
+
+def register_backend(name, deadline=30.0, engine=None):
+    """Decorator that adds a recognition function to the backend registry"""
+    def decorator(fn):
+        BACKENDS[name] = {'recognize': fn, 'deadline': deadline, 'engine': engine}
+        return fn
+    return decorator
+
+
+@register_backend('Google', deadline=30.0, engine='google')
+def recognize_google(recognizer, audio, language='en-US'):
+    return recognizer.recognize_google(audio, language=language)
+
+
+@register_backend('Sphinx (Offline)', deadline=60.0, engine='sphinx')
+def recognize_sphinx(recognizer, audio, language='en-US'):
+    return recognizer.recognize_sphinx(audio, language=language)
+
+
+def run_backends(recognizer, audio, language='en-US', backends=None, deadline=None):
+    """
+    Run several backends on the same audio at the same time
+
+    Every backend gets its own thread. Results are yielded as (name, result)
+    in completion order, so the comparison takes as long as the slowest
+    backend instead of the sum. A backend that misses its deadline (or the
+    deadline override) is reported as timed out and abandoned; its thread is
+    not waited for. A backend with no model for language is reported as
+    unsupported without running it.
+    """
+    names = []
+    for name in backends or BACKENDS:
+        if can_serve(recognizer, BACKENDS[name]['engine'], language):
+            names.append(name)
+        else:
+            yield name, {'status': f'⚪ Unsupported for {language}', 'unsupported': True}
+    if not names:
+        return
+    pool = ThreadPoolExecutor(max_workers=len(names), thread_name_prefix='backend')
+    start = time.time()
+    futures = {}
+    for name in names:
+        backend = BACKENDS[name]
+        futures[pool.submit(_timed, backend['recognize'], recognizer, audio, language)] = (
+            name, start + (deadline if deadline is not None else backend['deadline'])
+        )
+
+    try:
+        while futures:
+            next_deadline = min(expires for _, expires in futures.values())
+            done, _ = wait(futures, timeout=max(0, next_deadline - time.time()),
+                           return_when=FIRST_COMPLETED)
+            for future in done:
+                name, _ = futures.pop(future)
+                try:
+                    text, time_taken = future.result()
+                    yield name, {'text': text, 'time': time_taken, 'status': '✅ Success'}
+                except Exception as e:
+                    yield name, {'status': f'❌ Failed: {str(e)}'}
+
+            # Give up on anything past its deadline
+            now = time.time()
+            for future, (name, expires) in list(futures.items()):
+                if expires <= now:
+                    future.cancel()
+                    del futures[future]
+                    yield name, {'status': f'⏰ Timed out after {expires - start:.1f}s'}
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+class CircuitBreaker:
+    """
+    Skip a failing backend for a cool-down window
+
+    After `threshold` consecutive failures the breaker opens and allow()
+    returns False for `cooldown` seconds. Then a single trial request is
+    let through (half-open); its outcome closes or re-opens the breaker.
+    """
+
+    def __init__(self, threshold=3, cooldown=30.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        return 'open' if time.time() - self.opened_at < self.cooldown else 'half-open'
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def record(self, success):
+        with self._lock:
+            self._trial = False
+            if success:
+                self.failures = 0
+                self.opened_at = None
+                return
+            self.failures += 1
+            if self.failures >= self.threshold or self.opened_at is not None:
+                self.opened_at = time.time()
+
+
+def recognize_hedged(recognizer, audio, language='en-US', budget=None, breaker=None,
+                     primary='google', fallback='sphinx'):
+    """
+    recognize_best() with a latency-bounded fallback engine
+
+    The primary engine runs first. If it hasn't answered within `budget`
+    seconds, or fails with a RequestError, the fallback engine starts on
+    the same audio and whichever succeeds first is returned; the loser's
+    thread is abandoned, not waited for. While `breaker` is open the
+    primary is skipped entirely. budget=None disables the fallback, and so
+    does a fallback that can't serve the language (Sphinx without a model
+    for it): then the primary is always tried and waited for.
+
+    The breaker records how the primary request ended, even when that is
+    after the budget, so a slow endpoint that still answers is not treated
+    as a dead one. Returns a dict with text, confidence, alternatives,
+    engine and fallback_reason (None when the primary answered).
+    """
+    def result(future, engine, reason=None):
+        text, confidence, alternatives = future.result()
+        return {'text': text, 'confidence': confidence, 'alternatives': alternatives,
+                'engine': engine, 'fallback_reason': reason}
+
+    if budget is not None and not can_serve(recognizer, fallback, language):
+        budget = None
+
+    pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='hedge')
+    try:
+        futures = {}
+        if budget is None or breaker is None or breaker.allow():
+            primary_future = pool.submit(recognize_best, recognizer, audio, language, primary)
+            futures[primary_future] = primary
+            if budget is None:
+                return result(primary_future, primary)
+            if breaker is not None:
+                def record(future):
+                    error = future.exception()
+                    breaker.record(error is None or isinstance(error, sr.UnknownValueError))
+                primary_future.add_done_callback(record)
+
+            done, _ = wait([primary_future], timeout=budget)
+            if done:
+                error = primary_future.exception()
+                if not isinstance(error, sr.RequestError):
+                    return result(primary_future, primary)
+                reason = f"{primary} failed: {error}"
+            else:
+                reason = f"{primary} did not answer within {budget:.1f}s"
+        else:
+            reason = f"{primary} skipped for {breaker.cooldown:.0f}s after repeated failures"
+
+        futures[pool.submit(recognize_best, recognizer, audio, language, fallback)] = fallback
+
+        # Whichever engine succeeds first wins
+        errors = {}
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    engine = futures[future]
+                    return result(future, engine, None if engine == primary else reason)
+                errors[futures[future]] = future.exception()
+        if any(isinstance(error, sr.UnknownValueError) for error in errors.values()):
+            raise sr.UnknownValueError()
+        raise errors.get(primary) or errors[fallback]
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def can_serve(recognizer, engine, language):
+    """False when engine is known to have no model for language (only Sphinx can tell)"""
+    if engine != 'sphinx':
+        return True
+    warm = getattr(recognizer, 'warm', None)
+    if warm is not None:
+        return warm(language)
+    data_dir = os.path.join(os.path.dirname(os.path.realpath(sr.__file__)), 'pocketsphinx-data', language)
+    return os.path.isdir(data_dir)
+
+
+def scale_budget(budget, audio, reference_seconds=10.0):
+    """A latency budget meant for up to reference_seconds of audio, stretched in proportion for longer audio"""
+    if budget is None:
+        return None
+    seconds = len(audio.frame_data) / (audio.sample_rate * audio.sample_width)
+    return budget * max(1.0, seconds / reference_seconds)
+
+
+def _timed(fn, *args):
+    start = time.time()
+    result = fn(*args)
+    return result, time.time() - start
+
+
+def format_timestamp(seconds):
+    """Format seconds as mm:ss.s"""
+    minutes, seconds = divmod(seconds, 60)
+    return f"{int(minutes):02d}:{seconds:04.1f}"
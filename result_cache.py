@@ -0,0 +1,93 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+
+def cache_key(audio, language, engine, **params):
+    """Content hash of the decoded audio plus everything that affects the result"""
+    digest = hashlib.sha256()
+    digest.update(audio.get_raw_data())
+    digest.update(json.dumps({
+        'sample_rate': audio.sample_rate,
+        'sample_width': audio.sample_width,
+        'language': language,
+        'engine': engine,
+        'params': params
+    }, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Two-tier transcription cache: an in-memory LRU plus an optional directory
+    of JSON files that survives restarts
+
+    Values must be JSON-serialisable. Disk hits are promoted into memory.
+    """
+
+    def __init__(self, max_entries=256, cache_dir=None):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+        if self.cache_dir:
+            try:
+                with open(self._path(key), encoding='utf-8') as f:
+                    value = json.load(f)
+            except (OSError, ValueError):
+                pass
+            else:
+                with self._lock:
+                    self.hits += 1
+                    self.disk_hits += 1
+                self._remember(key, value)
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, value):
+        self._remember(key, value)
+        if self.cache_dir:
+            # Write then rename so a crash never leaves a half-written entry
+            tmp_path = f"{self._path(key)}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(value, f)
+                os.replace(tmp_path, self._path(key))
+            except (OSError, TypeError, ValueError):
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits,
+                    'disk_hits': self.disk_hits, 'misses': self.misses}
@@ -0,0 +1,261 @@
+import re
+
+import numpy as np
+
+
+_PUNCTUATION = re.compile(r'[^\w\s]')
+
+
+def normalize_text(text):
+    """Lowercase, strip punctuation and collapse whitespace (as in the Lab3 notebook)"""
+    if not text:
+        return ""
+    return ' '.join(_PUNCTUATION.sub('', text.lower()).split())
+
+
+class TokenInterner:
+    """Maps tokens to small integer ids so sequences compare as int arrays"""
+
+    def __init__(self):
+        self.ids = {}
+
+    def encode(self, tokens):
+        ids = self.ids
+        return np.fromiter((ids.setdefault(token, len(ids)) for token in tokens), dtype=np.int32, count=len(tokens))
+
+    def encode_packed(self, token_lists):
+        """Encode many token lists in one pass, as packed (flat, starts, lengths)"""
+        flat = [token for tokens in token_lists for token in tokens]
+        ids = self.ids
+        for token in dict.fromkeys(flat):
+            ids.setdefault(token, len(ids))
+        codes = np.fromiter(map(ids.__getitem__, flat), dtype=np.int32, count=len(flat))
+        return _packed(codes, [len(tokens) for tokens in token_lists])
+
+
+# Sequences are handled packed: one flat int32 array plus per-sequence starts and lengths
+
+def _packed(flat, lengths):
+    lengths = np.asarray(lengths, dtype=np.int64)
+    return flat, np.cumsum(lengths) - lengths, lengths
+
+
+def _pack(sequences):
+    if not len(sequences):
+        return _packed(np.zeros(0, dtype=np.int32), [])
+    return _packed(np.concatenate([np.asarray(seq, dtype=np.int32) for seq in sequences]),
+                   [len(seq) for seq in sequences])
+
+
+def _pack_chars(texts):
+    """Code points of every text, packed"""
+    flat = np.frombuffer(''.join(texts).encode('utf-32-le'), dtype='<u4').astype(np.int32)
+    return _packed(flat, [len(text) for text in texts])
+
+
+def _pad(packed, idx, width, fill):
+    """Rows idx of a packed sequence set as a (len(idx), width) matrix padded with fill"""
+    flat, starts, lengths = packed
+    cols = np.arange(width)
+    present = cols < lengths[idx, None]
+    out = np.full((len(idx), width), fill, dtype=np.int32)
+    out[present] = flat[(starts[idx, None] + cols)[present]]
+    return out
+
+
+def edit_ops(references, hypotheses, chunk_size=2048):
+    """
+    Substitutions, deletions and insertions for many token-id sequence pairs
+
+    Pairs are sorted by length and processed in chunks; within a chunk the
+    Levenshtein table is filled one hypothesis position at a time for
+    every pair at once. The within-row deletion chain is resolved with a
+    running minimum, so each row is a handful of array operations. Edits
+    cost BIG (substitution) or BIG + 1 (insertion/deletion), which keeps
+    the minimum edit count while preferring substitutions; the counts of
+    each operation are then recovered from the total without a backtrace.
+
+    Returns an (n, 3) int array of [substitutions, deletions, insertions].
+    """
+    return _edit_ops(_pack(references), _pack(hypotheses), chunk_size)
+
+
+def _edit_ops(references, hypotheses, chunk_size=2048):
+    ref_lens, hyp_lens = references[2], hypotheses[2]
+    n = len(ref_lens)
+    ops = np.zeros((n, 3), dtype=np.int64)
+    if not n:
+        return ops
+    order = np.lexsort((hyp_lens, ref_lens))
+
+    for start in range(0, n, chunk_size):
+        idx = order[start:start + chunk_size]
+        batch = len(idx)
+        r_lens, h_lens = ref_lens[idx], hyp_lens[idx]
+        max_r, max_h = int(r_lens.max()), int(h_lens.max())
+        big = max_r + max_h + 1
+        dtype = np.int32 if big * (max_r + max_h + 1) < 2 ** 31 else np.int64
+        indel = dtype(big + 1)
+
+        # Padding values never match each other or a real token
+        ref = _pad(references, idx, max_r, -1)
+        hyp = _pad(hypotheses, idx, max_h, -2)
+
+        rows = np.arange(batch)
+        steps = np.arange(max_r + 1, dtype=dtype) * indel
+        prev = np.broadcast_to(steps, (batch, max_r + 1)).copy()
+        totals = np.zeros(batch, dtype=np.int64)
+        done = h_lens == 0
+        totals[done] = prev[done, r_lens[done]]
+
+        for j in range(1, max_h + 1):
+            cost = np.where(ref == hyp[:, j - 1:j], 0, big).astype(dtype)
+            cur = prev + indel
+            np.minimum(cur[:, 1:], prev[:, :-1] + cost, out=cur[:, 1:])
+            # cur[i] = min over k <= i of cur[k] + indel * (i - k)
+            cur = np.minimum.accumulate(cur - steps, axis=1) + steps
+            finished = h_lens == j
+            totals[finished] = cur[rows[finished], r_lens[finished]]
+            prev = cur
+
+        edits, indels = totals // big, totals % big
+        surplus = h_lens - r_lens
+        insertions = (indels + surplus) // 2
+        deletions = (indels - surplus) // 2
+        ops[idx, 0] = edits - insertions - deletions
+        ops[idx, 1] = deletions
+        ops[idx, 2] = insertions
+    return ops
+
+
+def edit_distance(references, hypotheses, chunk_size=8192):
+    """
+    Levenshtein distance for many symbol sequence pairs, bit-parallel
+
+    Myers' bit-vector algorithm in 64-bit blocks: one column of the
+    Levenshtein table is a few word operations per block, run for every
+    pair in a chunk at once. Match masks are built once per chunk for each
+    hypothesis symbol. Used for character-level scoring, where sequences
+    are long and only the distance is needed.
+    """
+    return _edit_distance(_pack(references), _pack(hypotheses), chunk_size)
+
+
+def _edit_distance(references, hypotheses, chunk_size=8192):
+    ref_lens, hyp_lens = references[2], hypotheses[2]
+    n = len(ref_lens)
+    distances = np.zeros(n, dtype=np.int64)
+    if not n:
+        return distances
+    order = np.lexsort((hyp_lens, ref_lens))
+    one = np.uint64(1)
+
+    for start in range(0, n, chunk_size):
+        idx = order[start:start + chunk_size]
+        batch = len(idx)
+        r_lens, h_lens = ref_lens[idx], hyp_lens[idx]
+        max_h = int(h_lens.max())
+        blocks = max(1, -(-int(r_lens.max()) // 64))
+
+        ref = _pad(references, idx, blocks * 64, -1)
+        hyp = _pad(hypotheses, idx, max_h, -2)
+
+        # peq[symbol, pair, block]: bit i set where ref[i] == symbol
+        alphabet, codes = np.unique(hyp, return_inverse=True)
+        codes = codes.reshape(batch, max_h)
+        peq = np.empty((len(alphabet), batch, blocks), dtype=np.uint64)
+        for a, symbol in enumerate(alphabet):
+            peq[a] = np.packbits(ref == symbol, axis=1, bitorder='little').view('<u8')
+
+        rows = np.arange(batch)
+        pv = np.full((batch, blocks), ~np.uint64(0), dtype=np.uint64)
+        mv = np.zeros((batch, blocks), dtype=np.uint64)
+        score = r_lens.copy()
+        # The last reference row of each pair lives in this block at this bit
+        last_block = (r_lens - 1) // 64
+        last_bit = ((r_lens - 1) % 64).astype(np.uint64)
+
+        for j in range(max_h):
+            eq_all = peq[codes[:, j], rows]
+            active = h_lens > j
+            # Row 0 of a global alignment grows by one per column
+            h_in = np.ones(batch, dtype=np.int64)
+            for b in range(blocks):
+                p, m, eq = pv[:, b], mv[:, b], eq_all[:, b]
+                x_v = eq | m
+                eq = eq | (h_in < 0).astype(np.uint64)
+                x_h = (((eq & p) + p) ^ p) | eq
+                p_h = m | ~(x_h | p)
+                m_h = p & x_h
+
+                tracked = active & (last_block == b)
+                score += tracked * (((p_h >> last_bit) & one).astype(np.int64)
+                                    - ((m_h >> last_bit) & one).astype(np.int64))
+                h_out = (p_h >> np.uint64(63)).astype(np.int64) - (m_h >> np.uint64(63)).astype(np.int64)
+
+                p_h = (p_h << one) | (h_in > 0).astype(np.uint64)
+                m_h = (m_h << one) | (h_in < 0).astype(np.uint64)
+                pv[:, b] = m_h | ~(x_v | p_h)
+                mv[:, b] = p_h & x_v
+                h_in = h_out
+
+        # An empty reference costs one insertion per hypothesis symbol
+        distances[idx] = np.where(r_lens > 0, score, h_lens)
+    return distances
+
+
+def score_batch(references, hypotheses, normalize=True):
+    """
+    WER, CER and alignment counts for many reference/hypothesis pairs
+
+    Words are interned to integer ids and aligned with edit_ops();
+    characters (spaces included, as jiwer does) are compared by code point
+    with the bit-parallel edit_distance(). Rates are fractions; a pair with
+    an empty reference gets NaN. similarity is 1 - character distance /
+    longer length, a normalized stand-in for difflib's ratio().
+
+    Returns a dict of per-pair arrays plus corpus-level 'corpus_wer' and
+    'corpus_cer' (total errors over total reference length).
+    """
+    if normalize:
+        references = [normalize_text(text) for text in references]
+        hypotheses = [normalize_text(text or '') for text in hypotheses]
+    else:
+        hypotheses = [text or '' for text in hypotheses]
+
+    interner = TokenInterner()
+    ref_words_packed = interner.encode_packed([text.split() for text in references])
+    word_ops = _edit_ops(ref_words_packed, interner.encode_packed([text.split() for text in hypotheses]))
+    ref_chars_packed, hyp_chars_packed = _pack_chars(references), _pack_chars(hypotheses)
+    char_errors = _edit_distance(ref_chars_packed, hyp_chars_packed)
+
+    ref_words = ref_words_packed[2]
+    ref_chars, hyp_chars = ref_chars_packed[2], hyp_chars_packed[2]
+    word_errors = word_ops.sum(axis=1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        wer = np.where(ref_words > 0, word_errors / np.maximum(ref_words, 1), np.nan)
+        cer = np.where(ref_chars > 0, char_errors / np.maximum(ref_chars, 1), np.nan)
+        longer = np.maximum(ref_chars, hyp_chars)
+        similarity = np.where(longer > 0, 1 - char_errors / np.maximum(longer, 1), np.nan)
+
+    return {
+        'wer': wer,
+        'cer': cer,
+        'accuracy': np.clip(1 - wer, 0, None),
+        'similarity': similarity,
+        'substitutions': word_ops[:, 0],
+        'deletions': word_ops[:, 1],
+        'insertions': word_ops[:, 2],
+        'hits': ref_words - word_ops[:, 0] - word_ops[:, 1],
+        'ref_words': ref_words,
+        'corpus_wer': word_errors.sum() / ref_words.sum() if ref_words.sum() else float('nan'),
+        'corpus_cer': char_errors.sum() / ref_chars.sum() if ref_chars.sum() else float('nan'),
+    }
+
+
+def score(reference, hypothesis, normalize=True):
+    """score_batch() for a single pair, as a dict of plain numbers"""
+    result = score_batch([reference], [hypothesis], normalize)
+    return {key: (value[0].item() if isinstance(value, np.ndarray) else float(value))
+            for key, value in result.items()}
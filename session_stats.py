@@ -0,0 +1,154 @@
+import math
+
+
+class LogHistogram:
+    """
+    Mergeable latency histogram with logarithmic buckets
+
+    Bucket i covers [min_value * growth**i, min_value * growth**(i+1)), so
+    quantiles are accurate to about (growth - 1) / 2 relative error. Adding
+    a value is O(1) and memory is fixed regardless of how many values were
+    added. Histograms with the same parameters can be merged by adding
+    their bucket counts.
+    """
+
+    def __init__(self, min_value=1e-3, max_value=1e4, growth=1.05):
+        self.min_value = min_value
+        self.growth = growth
+        self._log_growth = math.log(growth)
+        self.counts = [0] * (int(math.log(max_value / min_value) / self._log_growth) + 2)
+        self.total = 0
+
+    def _bucket(self, value):
+        if value < self.min_value:
+            return 0
+        return min(len(self.counts) - 1, int(math.log(value / self.min_value) / self._log_growth) + 1)
+
+    def add(self, value):
+        self.counts[self._bucket(value)] += 1
+        self.total += 1
+
+    def merge(self, other):
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+        self.total += other.total
+        return self
+
+    def quantile(self, q):
+        """Approximate q-quantile (0..1); the geometric midpoint of its bucket"""
+        if not self.total:
+            return None
+        rank = q * (self.total - 1)
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen > rank:
+                if i == 0:
+                    return self.min_value
+                return self.min_value * self.growth ** (i - 0.5)
+        return self.min_value * self.growth ** (len(self.counts) - 1.5)
+
+
+class StreamingStats:
+    """Count, sum, min, max and percentiles of a stream of values"""
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.histogram = LogHistogram()
+
+    def add(self, value):
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        self.histogram.add(value)
+
+    def merge(self, other):
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.histogram.merge(other.histogram)
+        return self
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else 0.0
+
+    def summary(self):
+        if not self.count:
+            return {'count': 0}
+        return {
+            'count': self.count, 'mean': self.mean, 'min': self.min, 'max': self.max,
+            # Clamp the bucket estimate to the exact observed range
+            'p50': min(max(self.histogram.quantile(0.50), self.min), self.max),
+            'p95': min(max(self.histogram.quantile(0.95), self.min), self.max),
+            'p99': min(max(self.histogram.quantile(0.99), self.min), self.max),
+        }
+
+
+class PerformanceStats:
+    """
+    Recognition latency and real-time factor per (engine, language)
+
+    Every record() is O(1); summaries merge a handful of fixed-size
+    histograms and never walk the transcription history.
+    """
+
+    def __init__(self):
+        self.groups = {}
+
+    def _group(self, engine, language):
+        key = (engine, language)
+        if key not in self.groups:
+            self.groups[key] = {'latency': StreamingStats(), 'rtf': StreamingStats(), 'failures': 0}
+        return self.groups[key]
+
+    def record(self, engine, language, latency, audio_duration=None, success=True):
+        group = self._group(engine, language)
+        if not success:
+            group['failures'] += 1
+            return
+        group['latency'].add(latency)
+        if audio_duration:
+            group['rtf'].add(latency / audio_duration)
+
+    def overall(self):
+        """
+        Latency, real-time factor and failures merged across every group
+
+        Cache hits (engines labelled '... (cached)') are left out: they ran
+        no recognition and would pull the latency and RTF down.
+        """
+        latency, rtf, failures = StreamingStats(), StreamingStats(), 0
+        for (engine, _), group in self.groups.items():
+            if engine.endswith('(cached)'):
+                continue
+            latency.merge(group['latency'])
+            rtf.merge(group['rtf'])
+            failures += group['failures']
+        return {'latency': latency, 'rtf': rtf, 'failures': failures}
+
+    def rows(self):
+        """One summary row per (engine, language) for display"""
+        rows = []
+        for (engine, language), group in sorted(self.groups.items()):
+            latency = group['latency'].summary()
+            rtf = group['rtf'].summary()
+            rows.append({
+                'Engine': engine,
+                'Language': language,
+                'OK': latency['count'],
+                'Failed': group['failures'],
+                'Mean (s)': round(latency.get('mean', 0), 3),
+                'Min (s)': round(latency.get('min', 0), 3),
+                'p50 (s)': round(latency.get('p50', 0), 3),
+                'p95 (s)': round(latency.get('p95', 0), 3),
+                'p99 (s)': round(latency.get('p99', 0), 3),
+                'Max (s)': round(latency.get('max', 0), 3),
+                'RTF': round(rtf.get('mean', 0), 3),
+            })
+        return rows
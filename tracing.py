@@ -0,0 +1,258 @@
+import contextvars
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# Upper bounds (seconds) of the Prometheus histogram buckets for stage durations
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_current_trace = contextvars.ContextVar('current_trace', default=None)
+
+
+class _NoopSpan:
+    """Shared do-nothing span returned while tracing is disabled"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def current_trace_id():
+    """Id of the trace running in this context, or None outside of one"""
+    trace = _current_trace.get()
+    return trace.id if trace is not None else None
+
+
+class Span:
+    def __init__(self, tracer, trace, name, attrs):
+        self.tracer = tracer
+        self.trace = trace
+        self.name = name
+        self.attrs = attrs
+        self.parent = None
+
+    def set(self, **attrs):
+        """Attach attributes (sizes, engine names, ...) to the span"""
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self.parent = self.trace.stack[-1] if self.trace.stack else None
+        self.trace.stack.append(self.name)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.start
+        self.trace.stack.pop()
+        if exc_type is not None:
+            self.attrs['error'] = exc_type.__name__
+        self.trace.spans.append({
+            'name': self.name, 'parent': self.parent,
+            'start': self.start - self.trace.start, 'duration': duration, **self.attrs
+        })
+        self.tracer.observe(self.name, duration)
+        return False
+
+
+class Trace:
+    """All spans recorded while handling one request"""
+
+    def __init__(self, name, attrs):
+        self.id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.attrs = attrs
+        self.spans = []
+        self.stack = []
+        self.start = time.perf_counter()
+        self.timestamp = time.time()
+        self.duration = None
+        self.profile = None
+        self.peak_memory = None
+
+    def to_dict(self):
+        data = {'trace_id': self.id, 'name': self.name, 'timestamp': self.timestamp,
+                'duration': self.duration, **self.attrs, 'spans': self.spans}
+        if self.peak_memory is not None:
+            data['peak_memory_bytes'] = self.peak_memory
+        if self.profile is not None:
+            data['profile'] = self.profile
+        return data
+
+
+class Tracer:
+    """
+    Lightweight per-stage timing
+
+    Use trace() around a request and span() around each stage inside it.
+    Stage durations feed Prometheus-style histograms (prometheus_text()),
+    and every finished trace is appended as one JSON line to trace_path.
+    When disabled, span() and trace() return a shared no-op context manager.
+
+    profile and track_memory can be switched at runtime to run cProfile or
+    tracemalloc over each top-level trace.
+    """
+
+    def __init__(self, enabled=True, trace_path=None, metrics_path=None):
+        self.enabled = enabled
+        self.trace_path = trace_path
+        self.metrics_path = metrics_path
+        self.profile = False
+        self.track_memory = False
+        self.last_trace = None
+        self._lock = threading.Lock()
+        self._file_lock = threading.Lock()
+        self._histograms = {}
+
+    def set_profiling(self, profile=False, track_memory=False):
+        """Switch the cProfile and tracemalloc hooks on or off at runtime"""
+        self.profile = profile
+        if self.track_memory and not track_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.track_memory = track_memory
+
+    def span(self, name, **attrs):
+        trace = _current_trace.get()
+        if not self.enabled or trace is None:
+            return NOOP_SPAN
+        return Span(self, trace, name, attrs)
+
+    def trace(self, name, **attrs):
+        """Start a trace; nested inside another trace this is just a span"""
+        if not self.enabled:
+            return NOOP_SPAN
+        if _current_trace.get() is not None:
+            return self.span(name, **attrs)
+        return _TraceContext(self, name, attrs)
+
+    def record(self, name, duration, **attrs):
+        """Add a stage measured elsewhere (e.g. on a worker thread) to the current trace"""
+        trace = _current_trace.get()
+        if not self.enabled or trace is None:
+            return
+        trace.spans.append({
+            'name': name, 'parent': trace.stack[-1] if trace.stack else None,
+            'start': None, 'duration': duration, **attrs
+        })
+        self.observe(name, duration)
+
+    def observe(self, name, duration):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = {'buckets': [0] * len(BUCKETS), 'count': 0, 'sum': 0.0}
+            for i, bound in enumerate(BUCKETS):
+                if duration <= bound:
+                    histogram['buckets'][i] += 1
+                    break
+            histogram['count'] += 1
+            histogram['sum'] += duration
+
+    def prometheus_text(self):
+        """Stage duration histograms in the Prometheus text exposition format"""
+        lines = [
+            '# HELP stt_stage_duration_seconds Time spent in each processing stage',
+            '# TYPE stt_stage_duration_seconds histogram',
+        ]
+        with self._lock:
+            histograms = {name: dict(h, buckets=list(h['buckets'])) for name, h in self._histograms.items()}
+        for name, histogram in sorted(histograms.items()):
+            label = name.replace('\\', '\\\\').replace('"', '\\"')
+            cumulative = 0
+            for bound, count in zip(BUCKETS, histogram['buckets']):
+                cumulative += count
+                lines.append(f'stt_stage_duration_seconds_bucket{{stage="{label}",le="{bound}"}} {cumulative}')
+            lines.append(f'stt_stage_duration_seconds_bucket{{stage="{label}",le="+Inf"}} {histogram["count"]}')
+            lines.append(f'stt_stage_duration_seconds_sum{{stage="{label}"}} {histogram["sum"]:.6f}')
+            lines.append(f'stt_stage_duration_seconds_count{{stage="{label}"}} {histogram["count"]}')
+        return '\n'.join(lines) + '\n'
+
+    def _finish(self, trace):
+        self.last_trace = trace
+        if self.trace_path:
+            line = json.dumps(trace.to_dict(), default=str)
+            with self._file_lock, open(self.trace_path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+        if self.metrics_path:
+            text = self.prometheus_text()
+            with self._file_lock:
+                tmp_path = f"{self.metrics_path}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.write(text)
+                os.replace(tmp_path, self.metrics_path)
+
+    def serve_metrics(self, port, host='0.0.0.0'):
+        """Serve prometheus_text() at http://host:port/metrics on a daemon thread"""
+        tracer = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip('/') != '/metrics':
+                    self.send_error(404)
+                    return
+                body = tracer.prometheus_text().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+        return server
+
+
+class _TraceContext:
+    def __init__(self, tracer, name, attrs):
+        self.tracer = tracer
+        self.trace = Trace(name, attrs)
+
+    def set(self, **attrs):
+        self.trace.attrs.update(attrs)
+
+    def __enter__(self):
+        self._token = _current_trace.set(self.trace)
+        self._profiler = None
+        if self.tracer.profile:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        if self.tracer.track_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        trace = self.trace
+        trace.duration = time.perf_counter() - trace.start
+        if exc_type is not None:
+            trace.attrs['error'] = exc_type.__name__
+        if self._profiler is not None:
+            self._profiler.disable()
+            out = io.StringIO()
+            pstats.Stats(self._profiler, stream=out).sort_stats('cumulative').print_stats(25)
+            trace.profile = out.getvalue()
+        if self.tracer.track_memory and tracemalloc.is_tracing():
+            trace.peak_memory = tracemalloc.get_traced_memory()[1]
+        _current_trace.reset(self._token)
+        self.tracer.observe(trace.name, trace.duration)
+        self.tracer._finish(trace)
+        return False
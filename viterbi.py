@@ -0,0 +1,133 @@
+import numpy as np
+
+
+def _log(p):
+    with np.errstate(divide='ignore'):
+        return np.log(np.asarray(p, dtype=np.float64))
+
+
+class ViterbiDecoder:
+    """
+    Log-domain Viterbi decoding for a fixed HMM, batched over sequences
+
+    pi, A and B are the probability-domain parameters used in the Lab9
+    notebook (A[i, j] from state i to j, B[state, symbol]). Everything is
+    kept as log probabilities, so long sequences don't underflow.
+
+    Each time step is vectorized across states and across every sequence
+    in the batch. When no state has more than half as many predecessors as
+    there are states (left-to-right models such as /h/e/l/o/), the step
+    only looks at each state's allowed predecessors, so it costs
+    O(states * max in-degree) instead of O(states^2). beam, if set, drops
+    states more than beam nats below the best one at each step.
+    """
+
+    def __init__(self, pi, A, B=None, beam=None):
+        self.log_pi = _log(pi)
+        self.log_A = _log(A)
+        self.log_B = _log(B) if B is not None else None
+        self.beam = beam
+        self.n_states = len(self.log_pi)
+
+        allowed = np.asarray(A) > 0
+        in_degree = allowed.sum(axis=0)
+        width = max(1, int(in_degree.max()))
+        self.sparse = width <= self.n_states // 2
+        if self.sparse:
+            # preds[k, j] is the k-th predecessor of j; padding points at an extra always -inf state
+            to_state, from_state = np.nonzero(allowed.T)
+            slot = np.arange(len(to_state)) - np.repeat(np.cumsum(in_degree) - in_degree, in_degree)
+            self.preds = np.full((width, self.n_states), self.n_states, dtype=np.int64)
+            self.preds[slot, to_state] = from_state
+            self.pred_log_A = np.full((width, self.n_states), -np.inf)
+            self.pred_log_A[slot, to_state] = self.log_A[from_state, to_state]
+
+    def decode(self, sequences):
+        """
+        Most likely state path of each discrete observation sequence
+
+        sequences is a list of symbol-index sequences (lengths may differ).
+        Returns a list of (state path array, log probability); the log
+        probability is -inf when the sequence is impossible under the model.
+        """
+        if self.log_B is None:
+            raise ValueError("decode() needs an emission matrix B; use decode_scores() for frame scores")
+        lengths = np.array([len(seq) for seq in sequences])
+        symbols = np.zeros((lengths.max(initial=0), len(sequences)), dtype=np.int64)
+        for b, seq in enumerate(sequences):
+            symbols[:len(seq), b] = seq
+        # Emission scores are looked up one step at a time rather than materialized for the whole batch
+        emissions = self.log_B.T
+        return self._run(lambda t: emissions[symbols[t]], len(symbols), lengths)
+
+    def decode_scores(self, log_likelihoods, lengths=None):
+        """
+        Viterbi over precomputed per-frame emission log-likelihoods
+
+        log_likelihoods is (batch, time, states), e.g. from a continuous
+        model. lengths gives each sequence's number of valid frames
+        (default: all of them).
+        """
+        scores = np.asarray(log_likelihoods, dtype=np.float64)
+        if scores.ndim == 2:
+            scores = scores[None]
+        lengths = np.full(len(scores), scores.shape[1]) if lengths is None else np.asarray(lengths)
+        return self._run(lambda t: scores[:, t], scores.shape[1], lengths)
+
+    def _run(self, step_scores, steps, lengths):
+        """The recursion and backtrace; step_scores(t) gives the (batch, states) emission scores at t"""
+        batch, n = len(lengths), self.n_states
+        if not steps:
+            return [(np.zeros(0, dtype=np.int64), 0.0) for _ in range(batch)]
+
+        rows = np.arange(batch)
+        states = np.arange(n)
+        shortest = lengths.min()
+        psi = np.empty((steps, batch, n), dtype=np.int16 if n < 2 ** 15 else np.int32)
+        psi[0] = states
+        delta = self._prune(self.log_pi + step_scores(0))
+        padded = np.full((batch, n + 1), -np.inf)
+
+        for t in range(1, steps):
+            if self.sparse:
+                padded[:, :n] = delta
+                candidates = np.take(padded, self.preds, axis=1)
+                candidates += self.pred_log_A
+                step_delta = candidates.max(axis=1)
+                # argmax over a few predecessor slots is much slower than comparing them one by one
+                step_psi = self.preds[-1]
+                for k in range(len(self.preds) - 2, -1, -1):
+                    step_psi = np.where(candidates[:, k] == step_delta, self.preds[k], step_psi)
+            else:
+                candidates = delta[:, :, None] + self.log_A
+                step_psi = candidates.argmax(axis=1)
+                step_delta = candidates.max(axis=1)
+            step_delta += step_scores(t)
+            step_delta = self._prune(step_delta)
+
+            if t < shortest:
+                delta = step_delta
+                psi[t] = step_psi
+            else:
+                # Finished sequences keep their scores and point back to themselves
+                active = (lengths > t)[:, None]
+                delta = np.where(active, step_delta, delta)
+                psi[t] = np.where(active, step_psi, states)
+
+        path = np.empty((batch, steps), dtype=np.int64)
+        path[:, -1] = delta.argmax(axis=1)
+        log_prob = delta[rows, path[:, -1]]
+        for t in range(steps - 1, 0, -1):
+            path[:, t - 1] = psi[t, rows, path[:, t]]
+        return [(path[b, :lengths[b]], float(log_prob[b])) for b in range(batch)]
+
+    def _prune(self, delta):
+        if self.beam is None:
+            return delta
+        floor = delta.max(axis=1, keepdims=True) - self.beam
+        return np.where(delta >= floor, delta, -np.inf)
+
+
+def viterbi(pi, A, B, obs_index, beam=None):
+    """Single-sequence convenience wrapper: (state path, log probability)"""
+    return ViterbiDecoder(pi, A, B, beam).decode([obs_index])[0]